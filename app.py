@@ -4,6 +4,16 @@ import os
 def create_app():
     app = Flask(__name__, template_folder='templates')
     app.secret_key = 'your_super_secret_key_for_sessions'
+
+    # Behind Render's proxy request.remote_addr is the proxy; trust that many X-Forwarded-For hops
+    proxy_hops = int(os.environ.get('TRUSTED_PROXY_HOPS', 1 if os.environ.get('RENDER') else 0))
+    if proxy_hops:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops)
+
+    # Finish any multi-dataset commit interrupted by a crash before the datasets are loaded
+    from utils.datastore import recover_transactions
+    recover_transactions()
     
     # AMCs Upload Folder
     amcs_upload_folder = os.path.join(os.getcwd(), 'uploads', 'amcs')
@@ -20,6 +30,24 @@ def create_app():
         except (ValueError, TypeError): return ""
     app.jinja_env.filters['int_sap'] = format_sap_id
 
+    from utils.fragment_cache import cache_fragment
+    app.jinja_env.globals['cache_fragment'] = cache_fragment
+
+    from utils.datastore import record_version
+    app.jinja_env.globals['record_version'] = record_version
+
+    from utils.metrics import init_metrics
+    init_metrics(app)
+
+    from utils.profiler import init_profiler
+    init_profiler(app)
+
+    from utils.http_cache import init_http_cache
+    init_http_cache(app)
+
+    from utils.session_store import init_session_store
+    init_session_store(app)
+
     from routes.auth_routes import auth_bp
     from routes.accommodation_routes import acc_bp
     from routes.staff_routes import staff_bp
@@ -39,6 +67,15 @@ def create_app():
     app.register_blueprint(store_bp)
     app.register_blueprint(assets_bp)
     app.register_blueprint(contracts_bp)
+
+    # With gunicorn --preload this runs once in the master, before the workers fork
+    from utils.preload import PRELOAD_DATASETS, preload_datasets
+    if PRELOAD_DATASETS:
+        from routes.staff_routes import employees_guard, get_countries_index
+        from routes.maintenance_routes import maintenance_guard
+        from routes.amcs_routes import amcs_guard
+        from routes.assets_routes import assets_guard
+        preload_datasets([employees_guard, maintenance_guard, amcs_guard, assets_guard], warm=[get_countries_index])
     
     return app
 
@@ -0,0 +1,19 @@
+import os
+from app import app
+
+# Optional async serving mode: uvicorn asgi:asgi_app
+# The event loop owns the sockets; each Flask request (file reads, JSON parsing,
+# Excel builds, attachment sends) runs on a bounded thread pool so slow I/O never
+# blocks the loop. The sync path (gunicorn app:app / python app.py) is unchanged.
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    raise RuntimeError("Async serving mode requires 'a2wsgi' and an ASGI server: pip install a2wsgi uvicorn")
+
+asgi_app = WSGIMiddleware(app, workers=ASGI_THREADS)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(asgi_app, host='127.0.0.1', port=int(os.environ.get('PORT', 8000)))
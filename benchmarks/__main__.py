@@ -0,0 +1,165 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import percentile, git_revision
+from benchmarks.datasets import generate
+from benchmarks.scenarios import build_scenarios
+
+def login(app, username, password):
+    client = app.test_client()
+    response = client.post('/login_action', data={'username': username, 'password': password})
+    if response.status_code != 302 or 'dashboard' not in response.headers.get('Location', ''):
+        raise SystemExit(f'Could not log in as {username}')
+    return client
+
+def send(client, scenario, manifest, i):
+    path, kwargs = scenario.build(manifest, i)
+    start = time.perf_counter()
+    response = client.open(path, method=scenario.method, **kwargs)
+    body = response.get_data()
+    elapsed = time.perf_counter() - start
+    response.close()
+    return elapsed, response.status_code, len(body)
+
+def run_scenario(client, scenario, manifest, iterations, warmup):
+    if scenario.max_iterations:
+        iterations = min(iterations, scenario.max_iterations)
+        warmup = 0
+    index = 0
+    for _ in range(warmup):
+        send(client, scenario, manifest, index)
+        index += 1
+
+    timings, statuses, sizes = [], {}, []
+    for _ in range(iterations):
+        elapsed, status, size = send(client, scenario, manifest, index)
+        index += 1
+        timings.append(elapsed)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        sizes.append(size)
+
+    # One more request under tracemalloc for the Python heap peak of this route
+    tracemalloc.start()
+    try:
+        send(client, scenario, manifest, index)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'method': scenario.method,
+        'client': scenario.client,
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+        'statuses': statuses,
+        'response_bytes': int(sum(sizes) / len(sizes)),
+        'peak_alloc_kib': peak // 1024,
+    }
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    print(f"\n{'scenario':<32}{'p50 ms':>12}{'base':>12}{'delta':>10}{'p95 ms':>12}{'base':>12}{'delta':>10}")
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            print(f"{name:<32}{current['p50_ms']:>12.2f}{'-':>12}{'':>10}{current['p95_ms']:>12.2f}{'-':>12}")
+            continue
+        deltas = []
+        for key in ('p50_ms', 'p95_ms'):
+            base = previous[key]
+            deltas.append(f'{(current[key] - base) / base * 100:+.1f}%' if base else '-')
+        print(f"{name:<32}{current['p50_ms']:>12.2f}{previous['p50_ms']:>12.2f}{deltas[0]:>10}"
+              f"{current['p95_ms']:>12.2f}{previous['p95_ms']:>12.2f}{deltas[1]:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Drive every route against generated datasets.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for the dataset sizes in benchmarks/datasets.py')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--only', action='append', default=[], help='Run scenarios whose name contains this text (repeatable)')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated working directory')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else os.path.join(
+        REPO_ROOT, 'benchmarks', 'results', datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+
+    workdir = tempfile.mkdtemp(prefix='beeah-bench-')
+    start = time.perf_counter()
+    manifest = generate(workdir, seed=args.seed, scale=args.scale)
+    generate_seconds = time.perf_counter() - start
+    print(f'Generated datasets in {workdir} ({generate_seconds:.1f}s): {manifest["counts"]}', file=sys.stderr)
+
+    # The app resolves its JSON files against the working directory and RENDER_DATA_DIR at import time
+    os.chdir(workdir)
+    os.environ['RENDER_DATA_DIR'] = workdir
+    start = time.perf_counter()
+    from app import app
+    startup_seconds = time.perf_counter() - start
+
+    clients = {
+        'admin': login(app, 'admin', manifest['password']),
+        'user': login(app, manifest['scoped_user'], manifest['password']),
+        'anon': app.test_client(),
+    }
+
+    results = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'scale': args.scale,
+            'counts': manifest['counts'],
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'generate_seconds': round(generate_seconds, 3),
+            'startup_seconds': round(startup_seconds, 3),
+        },
+        'scenarios': {},
+    }
+
+    for scenario in build_scenarios():
+        if args.only and not any(text in scenario.name for text in args.only):
+            continue
+        result = run_scenario(clients[scenario.client], scenario, manifest, args.iterations, args.warmup)
+        results['scenarios'][scenario.name] = result
+        print(f"{scenario.name:<32} p50 {result['p50_ms']:>10.2f} ms  p95 {result['p95_ms']:>10.2f} ms  "
+              f"peak {result['peak_alloc_kib']:>8} KiB  {result['statuses']}", file=sys.stderr)
+
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results['meta']['peak_rss_kib'] = peak_rss // 1024 if sys.platform == 'darwin' else peak_rss
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f'Results written to {output}', file=sys.stderr)
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+    os.chdir(REPO_ROOT)
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import datetime
+import hashlib
+import json
+import os
+import random
+
+# Sizes at scale=1.0; every count is multiplied by --scale
+BASE_COUNTS = {
+    'employees': 50000,
+    'issued_items': 1000000,
+    'maintenance': 100000,
+    'assets': 20000,
+    'amcs': 2000,
+    'contracts': 1000,
+    'master_items': 500,
+    'users': 200,
+}
+ACCOMMODATIONS = 40
+BEDS_PER_ROOM = 4
+ATTACHMENTS = 20
+
+FIRST_NAMES = ['Ahmed', 'Mohammed', 'Zakir', 'Ravi', 'Imran', 'Suresh', 'Ali', 'Omar', 'Rajesh', 'Bilal',
+               'Khalid', 'Arjun', 'Faisal', 'Hassan', 'Joseph', 'Anil', 'Tariq', 'Sanjay', 'Yusuf', 'Naveed']
+LAST_NAMES = ['Khan', 'Hussain', 'Kumar', 'Shah', 'Nair', 'Ahmed', 'Singh', 'Rahman', 'Iqbal', 'Das',
+              'Patel', 'Mirza', 'Thomas', 'Qureshi', 'Reddy']
+DESIGNATIONS = ['Driver', 'Cleaner', 'Supervisor', 'Technician', 'Helper', 'Electrician', 'Plumber',
+                'Foreman', 'IT Admin', 'Store Keeper', 'Mechanic', 'Security Guard']
+DEPARTMENTS = ['Tandeef', 'Waste Management', 'Recycling', 'Transport', 'Facilities', 'Environment', 'IT']
+EMPLOYEE_STATUSES = (['Active'] * 80) + (['Vacation'] * 6) + (['Resigned'] * 3) + (['Terminated'] * 1) + (['Vacant'] * 10)
+ITEM_WORDS = ['Mattress', 'Pillow', 'Blanket', 'Bedsheet', 'Towel', 'Soap', 'Bucket', 'Locker', 'Fan',
+              'Bulb', 'Chair', 'Uniform', 'Shoes', 'Gloves', 'Helmet', 'Mask', 'Detergent', 'Broom', 'Mop', 'Kettle']
+ITEM_SIZES = ['Small', 'Medium', 'Large', 'XL', 'Standard']
+ASSET_WORDS = ['Bed', 'Cupboard', 'AC Unit', 'Refrigerator', 'Washing Machine', 'Water Cooler', 'Table',
+               'TV', 'Microwave', 'Heater', 'Sofa', 'Bunk Bed', 'Fire Extinguisher', 'Router', 'CCTV Camera']
+BLOCKS = ['A', 'B', 'C', 'D']
+SECTIONS = ['Room', 'Kitchen', 'Washroom', 'Corridor', 'Laundry', 'Prayer Room']
+CONCERNS = ['Electrical', 'Plumbing', 'AC', 'Carpentry', 'Pest Control', 'Painting', 'Other']
+RISKS = ['Low', 'Medium', 'High']
+ISSUE_STATUSES = ['Open', 'In-Process', 'Closed']
+VENDORS = ['Al Futtaim Services', 'Emrill', 'Farnek', 'Imdaad', 'Transguard', 'EFS', 'Khidmah', 'Enova']
+AMC_TYPES = ['AC Maintenance', 'Pest Control', 'Fire Safety', 'Lift Maintenance', 'Water Tank Cleaning', 'Generator']
+CONTRACT_TYPES = ['Lease', 'Cleaning', 'Security', 'Catering', 'Laundry', 'Transport', 'Internet']
+
+def scaled_counts(scale):
+    return {name: max(1, int(round(count * scale))) for name, count in BASE_COUNTS.items()}
+
+def _write(directory, name, data):
+    with open(os.path.join(directory, name), 'w') as f:
+        json.dump(data, f, indent=4)
+
+def _date(rng, start=datetime.date(2022, 1, 1), days=1000):
+    return (start + datetime.timedelta(days=rng.randrange(days))).isoformat()
+
+def _name(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+def _attachments(rng, folder, prefix, ext):
+    # Stored the way utils.attachments stores uploads: sha256 name plus a refcount index
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for i in range(ATTACHMENTS):
+        content = f'%PDF-1.4 {prefix} {i} '.encode() + rng.randbytes(rng.randrange(20000, 200000))
+        name = hashlib.sha256(content).hexdigest() + ext
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(content)
+        names.append(name)
+    return names
+
+def generate_employees(rng, count, accommodations, nationalities):
+    employees = []
+    sap_id = 10000
+    for index, accommodation in enumerate(accommodations):
+        for bed in range(count // len(accommodations) + (1 if index < count % len(accommodations) else 0)):
+            room = f'R{bed // BEDS_PER_ROOM + 1:04d}'
+            status = rng.choice(EMPLOYEE_STATUSES)
+            if status == 'Vacant':
+                employees.append({
+                    'Accommodation': accommodation, 'Room': room, 'SAP ID': '', 'Emp Name': '',
+                    'Designation': '', 'Department': '', 'Status': 'Vacant', 'Nationality': ''
+                })
+                continue
+            sap_id += rng.randrange(1, 4)
+            employees.append({
+                'Accommodation': accommodation, 'Room': room, 'SAP ID': float(sap_id),
+                'Emp Name': _name(rng), 'Designation': rng.choice(DESIGNATIONS),
+                'Department': rng.choice(DEPARTMENTS), 'Status': status,
+                'Nationality': rng.choice(nationalities)
+            })
+    rng.shuffle(employees)
+    return employees
+
+def generate(directory, seed=42, scale=1.0):
+    # Writes a full set of datasets into directory (the app's working directory) and
+    # returns a manifest the scenarios use to pick valid SAP IDs, rooms, items and ids
+    rng = random.Random(seed)
+    counts = scaled_counts(scale)
+    os.makedirs(directory, exist_ok=True)
+
+    countries_file = os.path.join(os.path.dirname(__file__), '..', 'static', 'data', 'countries.json')
+    with open(countries_file, 'r', encoding='utf-8') as f:
+        nationalities = [c['name'] for c in json.load(f)][:60]
+
+    accommodations = [f'Accommodation {i + 1:02d}' for i in range(min(ACCOMMODATIONS, counts['employees']))]
+    employees = generate_employees(rng, counts['employees'], accommodations, nationalities)
+    _write(directory, 'data.json', employees)
+
+    staffed = [e for e in employees if e['Status'] != 'Vacant']
+    active = [e for e in employees if e['Status'] == 'Active']
+    vacant = [(e['Accommodation'], e['Room']) for e in employees if e['Status'] == 'Vacant']
+
+    items = sorted({f'{w} {s} {i}' for w in ITEM_WORDS for s in ITEM_SIZES for i in range(1, 6)})
+    items = items[:counts['master_items']]
+    _write(directory, 'store_items.json', items)
+
+    locations = ['Central Store'] + accommodations
+    inventory = [{'accommodation': loc, 'item_name': item, 'quantity': rng.randrange(1000, 100000), 'remarks': ''}
+                 for loc in locations for item in items if loc == 'Central Store' or rng.random() < 0.5]
+    _write(directory, 'store_inventory.json', inventory)
+
+    base_id = 1700000000000
+    issued = []
+    for i in range(counts['issued_items']):
+        emp = rng.choice(staffed)
+        issued.append({
+            'id': base_id + i, 'accommodation': emp['Accommodation'], 'item_name': rng.choice(items),
+            'quantity': rng.randrange(1, 5), 'sap_id': str(int(emp['SAP ID'])), 'emp_name': emp['Emp Name'],
+            'designation': emp['Designation'], 'department': emp['Department'],
+            'issue_date': _date(rng), 'remarks': ''
+        })
+    _write(directory, 'issued_items.json', issued)
+    issued_pair = (issued[0]['accommodation'], issued[0]['item_name'])
+    del issued
+
+    issues = []
+    for i in range(counts['maintenance']):
+        status = rng.choice(ISSUE_STATUSES)
+        issues.append({
+            'id': base_id + i, 'accommodation': rng.choice(accommodations), 'block': rng.choice(BLOCKS),
+            'section': rng.choice(SECTIONS), 'report_date': _date(rng),
+            'details': f'{rng.choice(CONCERNS)} problem reported in {rng.choice(SECTIONS).lower()}',
+            'status': status, 'closed_date': _date(rng) if status == 'Closed' else '',
+            'concern': rng.choice(CONCERNS), 'concern_other': '', 'risk': rng.choice(RISKS), 'remarks': ''
+        })
+    _write(directory, 'maintenance_data.json', issues)
+
+    asset_names = [f'{w} {m}' for w in ASSET_WORDS for m in ('Type A', 'Type B', 'Type C', 'Type D', 'Type E',
+                                                              'Type F', 'Type G', 'Type H', 'Type I', 'Type J')]
+    combos = [(acc, name, status) for acc in accommodations for name in asset_names for status in ('Available', 'Scrap')]
+    rng.shuffle(combos)
+    assets = []
+    for i, (acc, name, status) in enumerate(combos[:counts['assets']]):
+        asset = {'id': base_id + i, 'accommodation': acc, 'asset_name': name,
+                 'quantity': rng.randrange(100, 1000), 'status': status, 'remarks': ''}
+        if status == 'Available':
+            asset['received_from'] = rng.choice(VENDORS)
+        else:
+            emp = rng.choice(staffed)
+            asset.update({'sap_id': str(int(emp['SAP ID'])), 'emp_name': emp['Emp Name'],
+                          'designation': emp['Designation'], 'department': emp['Department'],
+                          'scrap_date': _date(rng)})
+        assets.append(asset)
+    _write(directory, 'assets_data.json', assets)
+
+    amc_files = _attachments(rng, os.path.join(directory, 'uploads', 'amcs'), 'amc', '.pdf')
+    amcs = [{'id': base_id + i, 'accommodation': rng.choice(accommodations), 'vendor': rng.choice(VENDORS),
+             'service_date': _date(rng), 'expiry_date': _date(rng, datetime.date(2025, 1, 1)),
+             'type': rng.choice(AMC_TYPES), 'remarks': '', 'attachment': amc_files[i % len(amc_files)]}
+            for i in range(counts['amcs'])]
+    _write(os.path.join(directory, 'uploads'), 'amcs.index.json',
+           {name: sum(1 for a in amcs if a['attachment'] == name) for name in amc_files})
+    _write(directory, 'amcs_data.json', amcs)
+
+    contract_files = _attachments(rng, os.path.join(directory, 'uploads', 'contracts'), 'contract', '.pdf')
+    _write(directory, 'contract_types.json', sorted(CONTRACT_TYPES))
+    contracts = [{'id': base_id + i, 'accommodation': rng.choice(accommodations),
+                  'contract_type': rng.choice(CONTRACT_TYPES), 'caption': f'Contract {i + 1}',
+                  'attachment': contract_files[i % len(contract_files)]}
+                 for i in range(counts['contracts'])]
+    _write(os.path.join(directory, 'uploads'), 'contracts.index.json',
+           {name: sum(1 for c in contracts if c['attachment'] == name) for name in contract_files})
+    _write(directory, 'contracts_data.json', contracts)
+
+    # Pre-hashed with a cheap method so logins measure the app, not pbkdf2 rounds
+    from werkzeug.security import generate_password_hash
+    password_hash = generate_password_hash('benchmark', method='pbkdf2:sha256:1000')
+    users = [{'username': 'admin', 'email': 'admin@example.com', 'password': password_hash,
+              'role': 'Admin', 'allowed_accommodations': []}]
+    for i in range(counts['users']):
+        users.append({'username': f'user{i:04d}', 'email': f'user{i:04d}@example.com', 'password': password_hash,
+                      'role': 'User', 'allowed_accommodations': rng.sample(accommodations, min(3, len(accommodations)))})
+    _write(directory, 'users.json', users)
+
+    available = [a for a in assets if a['status'] == 'Available']
+    scrap = [a for a in assets if a['status'] == 'Scrap']
+    return {
+        'seed': seed,
+        'scale': scale,
+        'counts': counts,
+        'accommodations': accommodations,
+        'active_sap_ids': [str(int(e['SAP ID'])) for e in active],
+        'vacant_rooms': vacant,
+        'nationalities': nationalities,
+        'items': items,
+        'issued_pair': issued_pair,
+        'stocked': [(i['accommodation'], i['item_name']) for i in inventory if i['accommodation'] != 'Central Store'],
+        'issue_ids': [issue['id'] for issue in issues],
+        'available_assets': [(a['accommodation'], a['asset_name']) for a in available],
+        'scrap_assets': [(a['accommodation'], a['asset_name']) for a in scrap],
+        'contract_ids': [c['id'] for c in contracts],
+        'amc_files': amc_files,
+        'contract_files': contract_files,
+        'users': [u['username'] for u in users[1:]],
+        'scoped_user': users[1]['username'] if len(users) > 1 else None,
+        'password': 'benchmark',
+    }
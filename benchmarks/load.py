@@ -0,0 +1,419 @@
+import argparse
+import collections
+import datetime
+import http.client
+import itertools
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import quote, urlencode, urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import percentile, git_revision
+from benchmarks.datasets import generate
+
+HOT_TARGETS = 4
+HOT_STOCK = 25
+
+class Client:
+    # One connection per request: a retried POST after a dropped keep-alive could apply twice
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+
+    def request(self, method, path, form=None):
+        body = urlencode(form, doseq=True) if form is not None else None
+        headers = {'Connection': 'close'}
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=300)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        finally:
+            conn.close()
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status, response.getheader('Location'), data
+
+    def follow(self, location):
+        # Browsers follow the post/redirect/get; this also consumes the flash message
+        parts = urlsplit(location)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        status, _, data = self.request('GET', path)
+        return status, data.decode('utf-8', 'replace')
+
+class Ledger:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.received = collections.Counter()
+        self.issued = collections.Counter()
+        self.issue_markers = collections.Counter()
+        self.asset_added = collections.Counter()
+        self.maintenance_tokens = []
+        self.staff_added = []
+        self.outcomes = collections.Counter()
+
+class Workload:
+    def __init__(self, manifest, stock_targets, asset_targets):
+        self.manifest = manifest
+        self.stock_targets = stock_targets
+        self.asset_targets = asset_targets
+        self.ledger = Ledger()
+        self.new_sap_ids = itertools.count(9000000)
+        self.ops = [
+            ('read', 'dashboard', 10, self.get('/dashboard')),
+            ('read', 'accommodation', 8, self.get('/accommodation')),
+            ('read', 'store', 8, self.get('/store')),
+            ('read', 'maintenance', 8, self.get('/maintenance')),
+            ('read', 'assets', 8, self.get('/assets')),
+            ('read', 'get_vacant_rooms', 8, self.get(lambda rng: f"/get_vacant_rooms/{quote(rng.choice(manifest['accommodations']))}")),
+            ('read', 'get_employee_details', 10, self.get(lambda rng: f"/get_employee_details/{rng.choice(manifest['active_sap_ids'])}")),
+            ('write', 'receive_stock', 7, self.receive_stock),
+            ('write', 'issue_to_employee', 7, self.issue_to_employee),
+            ('write', 'add_issue', 7, self.add_issue),
+            ('write', 'add_asset', 6, self.add_asset),
+            ('write', 'shift_staff', 4, self.shift_staff),
+            ('write', 'add_staff', 4, self.add_staff),
+            ('download', 'download_data', 2, self.post('/download_data', {})),
+            ('download', 'download_store_report', 2, self.post('/download_store_report', {'report_type': 'Stock', 'accommodation_report': ''})),
+            ('download', 'download_assets_report', 1, self.post('/download_assets_report', {'hidden_status': ''})),
+        ]
+        self.weights = [op[2] for op in self.ops]
+
+    def get(self, path):
+        def op(client, rng):
+            return client.request('GET', path(rng) if callable(path) else path)[0]
+        return op
+
+    def post(self, path, form):
+        def op(client, rng):
+            return client.request('POST', path, form)[0]
+        return op
+
+    def write(self, client, path, form, success_text, on_success):
+        name = path.split('/')[1]
+        # Latency covers the POST only; the follow-up GET tells us whether it applied
+        start = time.perf_counter()
+        status, location, _ = client.request('POST', path, form)
+        elapsed = time.perf_counter() - start
+        page_status, page = client.follow(location) if status == 302 and location else (status, '')
+        applied = status == 302 and page_status == 200 and success_text in page
+        if applied:
+            with self.ledger.lock:
+                on_success()
+        with self.ledger.lock:
+            self.ledger.outcomes[(name, 'applied' if applied else 'rejected')] += 1
+        return status, elapsed
+
+    def receive_stock(self, client, rng):
+        acc, item = rng.choice(self.stock_targets)
+        quantity = rng.randint(1, 5)
+        return self.write(client, '/receive_stock', {'accommodation': acc, 'item_name': item, 'quantity': quantity},
+                          f'Received {quantity} of', lambda: self.ledger.received.update({(acc, item): quantity}))
+
+    def issue_to_employee(self, client, rng):
+        acc, item = rng.choice(self.stock_targets)
+        quantity = rng.randint(1, 8)
+        return self.write(client, '/issue_to_employee', {
+            'accommodation_issue': acc, 'item_name_issue': item, 'quantity_issue': quantity,
+            'sap_id': rng.choice(self.manifest['active_sap_ids']), 'emp_name': 'Load Test', 'designation': 'Helper',
+            'department': 'Facilities', 'issue_date': '2024-06-01', 'remarks': 'load-test'},
+            f'Issued {quantity} of', lambda: (self.ledger.issued.update({(acc, item): quantity}), self.ledger.issue_markers.update({(acc, item): 1})))
+
+    def add_issue(self, client, rng):
+        token = f'load-{uuid.uuid4().hex}'
+        return self.write(client, '/add_issue', {
+            'accommodation': rng.choice(self.manifest['accommodations']), 'block': 'A', 'section': 'Room',
+            'report_date': '2024-06-01', 'details': token, 'status': 'Open', 'concern': 'Other', 'risk': 'Low', 'remarks': ''},
+            'New maintenance issue added successfully', lambda: self.ledger.maintenance_tokens.append(token))
+
+    def add_asset(self, client, rng):
+        acc, name = rng.choice(self.asset_targets)
+        quantity = rng.randint(1, 5)
+        return self.write(client, '/add_asset', {
+            'accommodation': acc, 'asset_name': name, 'quantity': quantity, 'received_from': 'Load Test', 'remarks': ''},
+            'Successfully added/updated asset', lambda: self.ledger.asset_added.update({(acc, name): quantity}))
+
+    def shift_staff(self, client, rng):
+        sap_id = rng.choice(self.manifest['active_sap_ids'])
+        acc, room = rng.choice(self.manifest['vacant_rooms'])
+        return self.write(client, f'/shift_staff/{sap_id}', {'new_accommodation': acc, 'new_room': room},
+                          'shifted successfully', lambda: None)
+
+    def add_staff(self, client, rng):
+        sap_id = next(self.new_sap_ids)
+        acc, room = rng.choice(self.manifest['vacant_rooms'])
+        return self.write(client, '/add_staff', {
+            'accommodation_name': acc, 'room_number': room, 'sap_id': sap_id, 'emp_name': f'Load {sap_id}',
+            'designation': 'Helper', 'department': 'Facilities', 'nationality': self.manifest['nationalities'][0]},
+            f'Successfully added Load {sap_id}.', lambda: self.ledger.staff_added.append(sap_id))
+
+def run_level(port, workload, concurrency, duration, seed):
+    samples = []
+    errors = collections.Counter()
+    samples_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(port)
+        client.request('POST', '/login_action', {'username': 'admin', 'password': workload.manifest['password']})
+        while time.perf_counter() < deadline:
+            kind, name, _, op = rng.choices(workload.ops, weights=workload.weights)[0]
+            start = time.perf_counter()
+            try:
+                result = op(client, rng)
+            except (OSError, http.client.HTTPException) as e:
+                with samples_lock:
+                    errors[f'{name}: {type(e).__name__}'] += 1
+                continue
+            status, elapsed = result if isinstance(result, tuple) else (result, time.perf_counter() - start)
+            with samples_lock:
+                samples.append((kind, name, elapsed))
+                if status >= 500:
+                    errors[f'{name}: HTTP {status}'] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    def summary(values):
+        if not values:
+            return {'count': 0}
+        return {'count': len(values), 'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 2), 'p99_ms': round(percentile(values, 0.99) * 1000, 2)}
+
+    by_kind = collections.defaultdict(list)
+    by_name = collections.defaultdict(list)
+    for kind, name, elapsed in samples:
+        by_kind[kind].append(elapsed)
+        by_name[name].append(elapsed)
+    return {
+        'concurrency': concurrency,
+        'seconds': round(wall, 2),
+        'throughput_rps': round(len(samples) / wall, 2),
+        'overall': summary([s[2] for s in samples]),
+        'by_kind': {k: summary(v) for k, v in sorted(by_kind.items())},
+        'by_operation': {k: summary(v) for k, v in sorted(by_name.items())},
+        'errors': dict(errors),
+    }
+
+def read_json(workdir, name):
+    with open(os.path.join(workdir, name), 'r') as f:
+        return json.load(f)
+
+def prepare_hot_targets(workdir, manifest, rng):
+    # A handful of contended records makes lost updates and overdrawn stock likely to show up
+    inventory = read_json(workdir, 'store_inventory.json')
+    stock_targets = rng.sample(manifest['stocked'], min(HOT_TARGETS, len(manifest['stocked'])))
+    for row in inventory:
+        if (row['accommodation'], row['item_name']) in stock_targets:
+            row['quantity'] = HOT_STOCK
+    with open(os.path.join(workdir, 'store_inventory.json'), 'w') as f:
+        json.dump(inventory, f, indent=4)
+    asset_targets = rng.sample(manifest['available_assets'], min(HOT_TARGETS, len(manifest['available_assets'])))
+    return stock_targets, asset_targets
+
+def check_invariants(workdir, workload, initial):
+    ledger = workload.ledger
+    violations = []
+
+    inventory = read_json(workdir, 'store_inventory.json')
+    issued = read_json(workdir, 'issued_items.json')
+    stock = {(r['accommodation'], r['item_name']): r.get('quantity', 0) for r in inventory}
+    for key, quantity in stock.items():
+        if quantity < 0:
+            violations.append(f'negative stock {quantity} for {key}')
+    markers = collections.Counter((r['accommodation'], r['item_name']) for r in issued if r.get('remarks') == 'load-test')
+    for key in workload.stock_targets:
+        expected = initial['stock'][key] + ledger.received[key] - ledger.issued[key]
+        if stock.get(key) != expected:
+            violations.append(f'stock for {key} is {stock.get(key)}, expected {expected} (lost update)')
+        if markers[key] != ledger.issue_markers[key]:
+            violations.append(f'{markers[key]} issue records for {key}, expected {ledger.issue_markers[key]}')
+
+    details = collections.Counter(r.get('details') for r in read_json(workdir, 'maintenance_data.json'))
+    lost = [t for t in ledger.maintenance_tokens if details[t] != 1]
+    if lost:
+        violations.append(f'{len(lost)} acknowledged maintenance issues missing or duplicated')
+
+    assets = {(a['accommodation'], a['asset_name']): a['quantity'] for a in read_json(workdir, 'assets_data.json') if a.get('status') == 'Available'}
+    for key in workload.asset_targets:
+        expected = initial['assets'][key] + ledger.asset_added[key]
+        if assets.get(key) != expected:
+            violations.append(f'asset quantity for {key} is {assets.get(key)}, expected {expected} (lost update)')
+
+    employees = read_json(workdir, 'data.json')
+    occupied = collections.Counter()
+    for e in employees:
+        if e.get('SAP ID') not in ('', None) and e.get('Status') not in ('Vacant', 'Checked-Out'):
+            occupied[int(float(e['SAP ID']))] += 1
+    doubled = [sap for sap, n in occupied.items() if n > 1]
+    if doubled:
+        violations.append(f'{len(doubled)} employees hold more than one bed, e.g. {doubled[:5]}')
+    beds = collections.Counter((e.get('Accommodation'), e.get('Room')) for e in employees if e.get('Accommodation') != 'N/A')
+    overfull = [room for room, n in beds.items() if n > initial['beds'].get(room, 0)]
+    if overfull:
+        violations.append(f'{len(overfull)} rooms have more beds than they started with, e.g. {overfull[:5]}')
+    missing = [sap for sap in initial['staffed'] if occupied[sap] != 1]
+    if missing:
+        violations.append(f'{len(missing)} original employees are no longer housed exactly once, e.g. {missing[:5]}')
+    missing = [sap for sap in ledger.staff_added if occupied[sap] != 1]
+    if missing:
+        violations.append(f'{len(missing)} acknowledged new employees are missing, e.g. {missing[:5]}')
+
+    return violations
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(workdir, port, workers, threads, preload=False):
+    env = dict(os.environ, RENDER_DATA_DIR=workdir)
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+               '--bind', f'127.0.0.1:{port}', '--timeout', '300', '--pythonpath', REPO_ROOT, 'app:app']
+    if preload:
+        env['PRELOAD_DATASETS'] = '1'
+        command.insert(-1, '--preload')
+    server = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(workdir, 'gunicorn.log'), 'w'))
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'gunicorn exited with {server.returncode}; see {workdir}/gunicorn.log')
+        try:
+            Client(port).request('GET', '/')
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise SystemExit('gunicorn did not start within 120s')
+
+def worker_memory(server):
+    # Linux only: RSS counts shared pages in every worker, PSS splits them, Private is what each worker owns
+    try:
+        with open(f'/proc/{server.pid}/task/{server.pid}/children') as f:
+            pids = [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+    workers = []
+    for pid in pids:
+        fields = {}
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3 and parts[2] == 'kB':
+                        fields[parts[0].rstrip(':')] = int(parts[1])
+        except OSError:
+            continue
+        workers.append({'pid': pid, 'rss_kib': fields.get('Rss'), 'pss_kib': fields.get('Pss'),
+                        'private_kib': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)})
+    return workers
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description='Mixed read/write load against gunicorn with consistency checks.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scale', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--preload', action='store_true', help='gunicorn --preload with PRELOAD_DATASETS=1')
+    parser.add_argument('--concurrency', default='1,2,4,8,16', help='Comma-separated client concurrency levels')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds per concurrency level')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/load-<timestamp>.json)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated working directory')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else os.path.join(
+        REPO_ROOT, 'benchmarks', 'results', datetime.datetime.now().strftime('load-%Y%m%d-%H%M%S') + '.json')
+
+    workdir = tempfile.mkdtemp(prefix='beeah-load-')
+    manifest = generate(workdir, seed=args.seed, scale=args.scale)
+    stock_targets, asset_targets = prepare_hot_targets(workdir, manifest, random.Random(args.seed))
+    employees = read_json(workdir, 'data.json')
+    initial = {
+        'stock': {(r['accommodation'], r['item_name']): r['quantity'] for r in read_json(workdir, 'store_inventory.json')},
+        'assets': {(a['accommodation'], a['asset_name']): a['quantity'] for a in read_json(workdir, 'assets_data.json') if a['status'] == 'Available'},
+        'beds': collections.Counter((e['Accommodation'], e['Room']) for e in employees),
+        'staffed': [int(e['SAP ID']) for e in employees if e['Status'] != 'Vacant'],
+    }
+    del employees
+    print(f'Generated datasets in {workdir}: {manifest["counts"]}', file=sys.stderr)
+
+    workload = Workload(manifest, stock_targets, asset_targets)
+    port = free_port()
+    server = start_server(workdir, port, args.workers, args.threads, args.preload)
+    levels = []
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(',')]:
+            level = run_level(port, workload, concurrency, args.duration, args.seed)
+            levels.append(level)
+            overall = level['overall']
+            print(f"concurrency {concurrency:>3}: {level['throughput_rps']:>8.1f} req/s  p50 {overall.get('p50_ms', 0):>9.1f} ms  "
+                  f"p95 {overall.get('p95_ms', 0):>9.1f} ms  p99 {overall.get('p99_ms', 0):>9.1f} ms  errors {sum(level['errors'].values())}", file=sys.stderr)
+        memory = worker_memory(server)
+    finally:
+        stop_server(server)
+
+    for worker in memory:
+        print(f"worker {worker['pid']}: RSS {worker['rss_kib']} KiB  PSS {worker['pss_kib']} KiB  private {worker['private_kib']} KiB", file=sys.stderr)
+    violations = check_invariants(workdir, workload, initial)
+    results = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'seed': args.seed,
+            'scale': args.scale,
+            'counts': manifest['counts'],
+            'workers': args.workers,
+            'threads': args.threads,
+            'preload': args.preload,
+            'duration': args.duration,
+        },
+        'levels': levels,
+        'worker_memory': memory,
+        'write_outcomes': {f'{name} {outcome}': n for (name, outcome), n in sorted(workload.ledger.outcomes.items())},
+        'violations': violations,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f'Results written to {output}', file=sys.stderr)
+
+    for violation in violations:
+        print(f'INVARIANT VIOLATED: {violation}', file=sys.stderr)
+    if not violations:
+        print('All invariants held.', file=sys.stderr)
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if violations else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import io
+import json
+import pandas as pd
+
+class Scenario:
+    # build(manifest, i) returns the path and test-client kwargs for iteration i, so
+    # mutating scenarios can pick a fresh employee, issue or asset on every request
+    def __init__(self, name, method, build, client='admin', max_iterations=None):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.client = client
+        self.max_iterations = max_iterations
+
+def get(name, path, client='admin'):
+    return Scenario(name, 'GET', lambda m, i: (path(m, i) if callable(path) else path, {}), client)
+
+def post(name, build, client='admin', max_iterations=None):
+    return Scenario(name, 'POST', build, client, max_iterations)
+
+def pick(values, i):
+    return values[i % len(values)]
+
+def xlsx_upload(field, filename, rows):
+    output = io.BytesIO()
+    pd.DataFrame(rows).to_excel(output, index=False)
+    return {field: (io.BytesIO(output.getvalue()), filename)}
+
+def attachment(field, i):
+    return {field: (io.BytesIO(b'%PDF-1.4 benchmark attachment ' + str(i).encode() * 2000), f'document_{i}.pdf')}
+
+def roster_upload(m, i):
+    with open('data.json', 'r') as f:
+        employees = json.load(f)
+    return '/upload', {'data': xlsx_upload('fileUpload', 'roster.xlsx', employees), 'content_type': 'multipart/form-data'}
+
+def form(path, data, files=None):
+    if files:
+        data = dict(data, **files)
+        return path, {'data': data, 'content_type': 'multipart/form-data'}
+    return path, {'data': data}
+
+def build_scenarios():
+    scenarios = [
+        # auth / dashboard
+        post('login', lambda m, i: form('/login_action', {'username': pick(m['users'], i), 'password': m['password']}), client='anon'),
+        get('dashboard', '/dashboard'),
+        get('dashboard_search', lambda m, i: f"/dashboard?search={pick(m['active_sap_ids'], i)[:4]}"),
+        get('dashboard_vacant', '/dashboard?status=Vacant'),
+        get('dashboard_location', lambda m, i: f"/dashboard?location={pick(m['accommodations'], i)}"),
+
+        # accommodation
+        get('accommodation', '/accommodation'),
+        get('accommodation_scoped', '/accommodation', client='user'),
+        post('download_data', lambda m, i: form('/download_data', {})),
+        post('download_data_filtered', lambda m, i: form('/download_data', {'filter_accommodation': pick(m['accommodations'], i), 'filter_status': 'Active'})),
+
+        # staff lookups
+        get('staff_details', lambda m, i: f"/staff/{pick(m['active_sap_ids'], i)}"),
+        get('get_employee_details', lambda m, i: f"/get_employee_details/{pick(m['active_sap_ids'], i)}"),
+        post('get_employees_details', lambda m, i: ('/get_employees_details', {'json': {'sap_ids': m['active_sap_ids'][i * 50:(i + 1) * 50]}})),
+        get('get_vacant_rooms', lambda m, i: f"/get_vacant_rooms/{pick(m['accommodations'], i)}"),
+        get('get_country_details', lambda m, i: f"/get_country_details/{pick(m['nationalities'], i)}"),
+
+        # staff writes; each iteration works on a different employee or vacant bed
+        post('update_staff', lambda m, i: form(f"/update_staff/{pick(m['active_sap_ids'], i)}", {
+            'emp_name': f'Benchmark {i}', 'designation': 'Driver', 'department': 'Transport',
+            'nationality': pick(m['nationalities'], i), 'status': 'Active'})),
+        post('shift_staff', lambda m, i: form(f"/shift_staff/{pick(m['active_sap_ids'], len(m['active_sap_ids']) // 2 + i)}", {
+            'new_accommodation': pick(m['vacant_rooms'], 2 * i)[0], 'new_room': pick(m['vacant_rooms'], 2 * i)[1]})),
+        post('add_staff', lambda m, i: form('/add_staff', {
+            'accommodation_name': pick(m['vacant_rooms'], 2 * i + 1)[0], 'room_number': pick(m['vacant_rooms'], 2 * i + 1)[1],
+            'sap_id': str(9000000 + i), 'emp_name': f'New Hire {i}', 'designation': 'Helper',
+            'department': 'Facilities', 'nationality': pick(m['nationalities'], i)})),
+        post('checkout_staff', lambda m, i: form(f"/checkout_staff/{pick(m['active_sap_ids'], -(i + 1))}", {})),
+        post('add_accommodation_data', lambda m, i: form('/add_accommodation_data', {}, xlsx_upload('addAccomFile', 'new_staff.xlsx', [
+            {'Accommodation': pick(m['accommodations'], n), 'Room': f'X{n:04d}', 'SAP ID': 8000000 + i * 100 + n,
+             'Emp Name': f'Added {n}', 'Designation': 'Cleaner', 'Department': 'Tandeef', 'Status': 'Active',
+             'Nationality': pick(m['nationalities'], n)} for n in range(50)]))),
+
+        # maintenance
+        get('maintenance', '/maintenance'),
+        get('maintenance_open', '/maintenance?status=Open'),
+        get('maintenance_scoped', '/maintenance', client='user'),
+        post('add_issue', lambda m, i: form('/add_issue', {
+            'accommodation': pick(m['accommodations'], i), 'block': 'A', 'section': 'Kitchen',
+            'report_date': '2024-05-01', 'details': f'Benchmark issue {i}', 'status': 'Open',
+            'concern': 'Plumbing', 'risk': 'Low', 'remarks': ''})),
+        post('update_issue', lambda m, i: form(f"/update_issue/{pick(m['issue_ids'], i)}", {
+            'accommodation': pick(m['accommodations'], i), 'block': 'B', 'section': 'Room',
+            'report_date': '2024-05-01', 'details': f'Updated issue {i}', 'status': 'Closed',
+            'closed_date': '2024-05-03', 'concern': 'AC', 'concern_other': '', 'risk': 'Medium', 'remarks': ''})),
+        post('delete_issue', lambda m, i: form(f"/delete_issue/{pick(m['issue_ids'], -(i + 1))}", {})),
+        post('upload_maintenance_issues', lambda m, i: form('/upload_maintenance_issues', {}, xlsx_upload('maintenance_file', 'issues.xlsx', [
+            {'accommodation': pick(m['accommodations'], n), 'block': 'C', 'section': 'Corridor',
+             'Report Date': '2024-06-01', 'details': f'Uploaded issue {n}', 'status': 'Open',
+             'Closed Date': '', 'concern': 'Electrical', 'risk': 'High', 'remarks': ''} for n in range(20)]))),
+        post('download_maintenance_report', lambda m, i: form('/download_maintenance_report', {'hidden_status': '', 'hidden_accommodation': ''})),
+
+        # assets
+        get('assets', '/assets'),
+        get('assets_scoped', '/assets', client='user'),
+        get('get_assets', lambda m, i: f"/get_assets/{pick(m['accommodations'], i)}/Available"),
+        post('add_asset', lambda m, i: form('/add_asset', {
+            'accommodation': pick(m['available_assets'], i)[0], 'asset_name': pick(m['available_assets'], i)[1],
+            'quantity': '5', 'received_from': 'Benchmark', 'remarks': ''})),
+        post('shift_asset', lambda m, i: form('/shift_asset', {
+            'source_accommodation': pick(m['available_assets'], i)[0], 'asset_name_shift': pick(m['available_assets'], i)[1],
+            'target_accommodation': pick(m['accommodations'], i + 1), 'quantity_shift': '1'})),
+        post('scrap_asset', lambda m, i: form('/scrap_asset', {
+            'scrap_accommodation': pick(m['available_assets'], -(i + 1))[0], 'asset_name_scrap': pick(m['available_assets'], -(i + 1))[1],
+            'quantity_scrap': '1', 'sap_id': pick(m['active_sap_ids'], i), 'emp_name': 'Benchmark',
+            'designation': 'Helper', 'department': 'Facilities', 'scrap_date': '2024-06-01', 'remarks': ''})),
+        post('remove_scrap', lambda m, i: form('/remove_scrap', {
+            'remove_accommodation': pick(m['scrap_assets'], i)[0], 'asset_name_remove': pick(m['scrap_assets'], i)[1], 'quantity_remove': '1'})),
+        post('download_assets_report', lambda m, i: form('/download_assets_report', {'hidden_status': ''})),
+
+        # AMCs
+        get('amcs', '/amcs'),
+        get('amcs_scoped', '/amcs', client='user'),
+        post('add_amc', lambda m, i: form('/add_amc', {
+            'accommodation_name': pick(m['accommodations'], i), 'vendor': 'Benchmark Services',
+            'service_date': '2024-01-01', 'expiry_date': '2025-01-01', 'type': 'Pest Control', 'remarks': ''},
+            attachment('attachment', i))),
+        get('amc_attachment', lambda m, i: f"/uploads/amcs/{pick(m['amc_files'], i)}"),
+
+        # contracts
+        get('contracts', '/contracts'),
+        post('add_contract_type', lambda m, i: form('/add_contract_type', {'type_name': f'Benchmark Type {i}'})),
+        post('add_contract', lambda m, i: form('/add_contract', {
+            'accommodation': pick(m['accommodations'], i), 'contract_type': 'Lease', 'caption': f'Benchmark contract {i}'},
+            attachment('attachment', i))),
+        get('contract_attachment', lambda m, i: f"/uploads/contracts/{pick(m['contract_files'], i)}"),
+        post('delete_contract', lambda m, i: form(f"/delete_contract/{pick(m['contract_ids'], i)}", {})),
+
+        # store
+        get('store_report', '/store'),
+        get('store_search', lambda m, i: f"/store?search={pick(m['items'], i).split()[0].lower()}"),
+        get('store_scoped', '/store', client='user'),
+        get('issued_details', lambda m, i: f"/issued_details/{m['issued_pair'][0]}/{m['issued_pair'][1]}"),
+        post('add_store_item', lambda m, i: form('/add_store_item', {'item_name': f'Benchmark Item {i}'})),
+        post('upload_master_items', lambda m, i: form('/upload_master_items', {}, xlsx_upload('master_items_file', 'items.xlsx',
+            [{'ItemName': f'Uploaded Item {i}-{n}'} for n in range(100)]))),
+        post('receive_stock', lambda m, i: form('/receive_stock', {
+            'accommodation': 'Central Store', 'item_name': pick(m['items'], i), 'quantity': '100'})),
+        post('distribute_stock', lambda m, i: form('/distribute_stock', {
+            'target_accommodation': pick(m['accommodations'], i), 'item_name_dist': pick(m['items'], i),
+            'quantity_dist': '10', 'emp_name': 'Benchmark', 'sap_id': pick(m['active_sap_ids'], i), 'remarks': ''})),
+        post('issue_to_employee', lambda m, i: form('/issue_to_employee', {
+            'accommodation_issue': pick(m['stocked'], i)[0], 'item_name_issue': pick(m['stocked'], i)[1],
+            'quantity_issue': '1', 'sap_id': pick(m['active_sap_ids'], i), 'emp_name': 'Benchmark',
+            'designation': 'Helper', 'department': 'Facilities', 'issue_date': '2024-06-01', 'remarks': ''})),
+        post('download_issued_details', lambda m, i: form(f"/download_issued_details/{m['issued_pair'][0]}/{m['issued_pair'][1]}", {})),
+        post('download_store_report_stock', lambda m, i: form('/download_store_report', {'report_type': 'Stock', 'accommodation_report': ''})),
+        post('download_store_report_issued', lambda m, i: form('/download_store_report', {'report_type': 'Issued', 'accommodation_report': pick(m['accommodations'], i)})),
+        post('download_store_report_balance', lambda m, i: form('/download_store_report', {'report_type': 'Balance', 'accommodation_report': ''})),
+
+        # settings
+        get('settings', '/settings'),
+        get('edit_user', lambda m, i: f"/edit_user/{pick(m['users'], i)}"),
+        post('add_user', lambda m, i: form('/add_user', {
+            'username': f'bench{i:04d}', 'email': f'bench{i:04d}@example.com', 'password': 'benchmark',
+            'role': 'User', 'allowed_accommodations': m['accommodations'][:2]})),
+        post('update_user', lambda m, i: form(f"/update_user/{pick(m['users'], -(i + 1))}", {
+            'email': f'updated{i}@example.com', 'role': 'User', 'allowed_accommodations': m['accommodations'][:3]})),
+
+        # roster-wide operations last: they reshape the employee dataset the others rely on
+        post('manage_accommodation_shift', lambda m, i: form('/manage_accommodation', {
+            'source_accommodation': m['accommodations'][-(i + 1)], 'target_accommodation': m['accommodations'][0], 'action': 'shift'}), max_iterations=5),
+        Scenario('upload_roster', 'POST', roster_upload, max_iterations=3),
+    ]
+    return scenarios
@@ -0,0 +1,120 @@
+import argparse
+import datetime
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import percentile, git_revision
+from benchmarks.datasets import generate
+
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'xlsxwriter', 'pyinstrument')
+FIRST_REQUESTS = ('/dashboard', '/accommodation', '/assets', '/maintenance', '/amcs', '/store', '/contracts')
+
+# Runs in a fresh interpreter so every measurement is a cold worker boot
+PROBE = '''
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+from app import app
+import_ms = (time.perf_counter() - start) * 1000
+after_import = [m for m in sys.argv[4].split(',') if m in sys.modules]
+rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+client = app.test_client()
+client.post('/login_action', data={'username': 'admin', 'password': sys.argv[2]})
+first = {}
+for path in sys.argv[3].split(','):
+    start = time.perf_counter()
+    status = client.get(path).status_code
+    first[path] = {'ms': round((time.perf_counter() - start) * 1000, 3), 'status': status}
+print(json.dumps({'import_ms': round(import_ms, 3), 'rss_kib': rss_kib, 'modules_after_import': after_import,
+                  'modules_after_requests': [m for m in sys.argv[4].split(',') if m in sys.modules], 'first_requests': first}))
+'''
+
+def export_revision(revision, directory):
+    # The tree at another revision, without touching the working copy
+    archive = subprocess.check_output(['git', 'archive', revision], cwd=REPO_ROOT)
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+    return directory
+
+def probe(source_root, workdir, password):
+    env = dict(os.environ, RENDER_DATA_DIR=workdir)
+    output = subprocess.check_output([sys.executable, '-c', PROBE, source_root, password, ','.join(FIRST_REQUESTS), ','.join(HEAVY_MODULES)],
+                                     cwd=workdir, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure_source(label, source_root, workdir, password, runs):
+    samples = [probe(source_root, workdir, password) for _ in range(runs)]
+    imports = [s['import_ms'] for s in samples]
+    result = {
+        'source': label,
+        'runs': runs,
+        'import_p50_ms': round(percentile(imports, 0.50), 3),
+        'import_max_ms': round(max(imports), 3),
+        'rss_p50_kib': percentile([s['rss_kib'] for s in samples], 0.50),
+        'modules_after_import': samples[-1]['modules_after_import'],
+        'modules_after_requests': samples[-1]['modules_after_requests'],
+        'first_requests': {path: {'p50_ms': round(percentile([s['first_requests'][path]['ms'] for s in samples], 0.50), 3),
+                                  'status': samples[-1]['first_requests'][path]['status']} for path in FIRST_REQUESTS},
+    }
+    result['boot_to_served_p50_ms'] = round(result['import_p50_ms'] + sum(r['p50_ms'] for r in result['first_requests'].values()), 3)
+    return result
+
+def report(results):
+    for result in results:
+        print(f"\n{result['source']}: import p50 {result['import_p50_ms']:.1f} ms (max {result['import_max_ms']:.1f}), "
+              f"RSS after import {result['rss_p50_kib']} KiB, boot + first pages {result['boot_to_served_p50_ms']:.1f} ms")
+        print(f"  heavy modules at import: {', '.join(result['modules_after_import']) or 'none'}")
+        print(f"  heavy modules after first pages: {', '.join(result['modules_after_requests']) or 'none'}")
+        for path, first in result['first_requests'].items():
+            print(f"  first {path:<16}{first['p50_ms']:>10.1f} ms  ({first['status']})")
+    if len(results) == 2:
+        current, base = results
+        if base['import_p50_ms']:
+            print(f"\nimport time vs {base['source']}: {(current['import_p50_ms'] - base['import_p50_ms']) / base['import_p50_ms'] * 100:+.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description='Cold worker start-up time: app import and first request per page.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scale', type=float, default=0.1)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per source tree')
+    parser.add_argument('--compare', metavar='REVISION', help='Also measure this git revision (e.g. HEAD~1) on the same data')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/startup-<timestamp>.json)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated working directory')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else os.path.join(
+        REPO_ROOT, 'benchmarks', 'results', datetime.datetime.now().strftime('startup-%Y%m%d-%H%M%S') + '.json')
+
+    workdir = tempfile.mkdtemp(prefix='beeah-startup-')
+    manifest = generate(workdir, seed=args.seed, scale=args.scale)
+    print(f'Generated datasets in {workdir}: {manifest["counts"]}', file=sys.stderr)
+
+    try:
+        results = [measure_source(git_revision() or 'working tree', REPO_ROOT, workdir, manifest['password'], args.runs)]
+        if args.compare:
+            source_root = export_revision(args.compare, tempfile.mkdtemp(prefix='beeah-startup-src-'))
+            try:
+                results.append(measure_source(args.compare, source_root, workdir, manifest['password'], args.runs))
+            finally:
+                shutil.rmtree(source_root, ignore_errors=True)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report(results)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'meta': {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'revision': git_revision(),
+                            'seed': args.seed, 'scale': args.scale, 'counts': manifest['counts']}, 'results': results}, f, indent=4)
+    print(f'Results written to {output}', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,9 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash, Response
-from routes.staff_routes import all_employees, countries_data
+from routes.staff_routes import get_employees, get_roster_columns, get_countries, get_countries_version, employees_guard
+from utils.permissions import scoped_records, allowed_scope
+from utils.exports import dataframe_to_xlsx
+from utils.roster import employees_to_records
 from collections import Counter
-import io
-import pandas as pd
 
 acc_bp = Blueprint('acc_bp', __name__)
 
@@ -13,46 +14,78 @@ def accommodation_data():
 
     role = session.get('role')
     allowed = session.get('allowed_accommodations', [])
+    acc_filter = request.args.get('accommodation')
+
+    if acc_filter and role not in ['Admin', 'Manager'] and acc_filter not in allowed:
+        flash("Access Denied.")
+        return redirect(url_for('acc_bp.accommodation_data'))
+
+    # the version of the roster this worker renders from, so cached fragments match their content
+    employees_version = employees_guard.refresh()
+    roster = get_roster_columns()
+    if roster is not None:
+        scope = roster.scope(allowed_scope())
+        accommodations = sorted(roster.distinct('Accommodation', roster.everything())) if role in ['Admin', 'Manager'] else allowed
+        departments = sorted(department for department in roster.distinct('Department', scope) if department)
+        occupied = scope & ~roster.equals('Status', 'Vacant')
+        if acc_filter:
+            department_summary = roster.counts('Department', occupied & roster.equals('Accommodation', acc_filter))
+        else:
+            department_summary = {department: count for department, count in roster.counts('Department', occupied).items() if department}
+        return render_accommodation_page(accommodations, departments, acc_filter, department_summary, employees_version)
 
     if role in ['Admin', 'Manager']:
-        accommodations = sorted(list(set(emp['Accommodation'] for emp in all_employees)))
-        data_to_process = all_employees
+        accommodations = sorted(list(set(emp['Accommodation'] for emp in get_employees())))
+        data_to_process = get_employees()
     else:
         accommodations = allowed
-        data_to_process = [emp for emp in all_employees if emp.get('Accommodation') in allowed]
+        data_to_process = scoped_records(get_employees(), 'employees', field='Accommodation', version=employees_version)
 
     departments = sorted(list(set(emp.get('Department') for emp in data_to_process if emp.get('Department'))))
     
-    acc_filter = request.args.get('accommodation')
     department_summary = {}
     
     if acc_filter:
-        if role not in ['Admin', 'Manager'] and acc_filter not in allowed:
-            flash("Access Denied.")
-            return redirect(url_for('acc_bp.accommodation_data'))
-        
         filtered_employees = [emp for emp in data_to_process if emp['Accommodation'] == acc_filter and emp.get('Status') != 'Vacant']
         department_summary = dict(Counter(emp['Department'] for emp in filtered_employees))
     else:
         all_emp_for_summary = [emp for emp in data_to_process if emp.get('Status') != 'Vacant']
         department_summary = dict(Counter(emp['Department'] for emp in all_emp_for_summary if emp.get('Department')))
 
+    return render_accommodation_page(accommodations, departments, acc_filter, department_summary, employees_version)
+
+def render_accommodation_page(accommodations, departments, acc_filter, department_summary, employees_version):
     return render_template(
         'accommodation.html', 
         accommodations=accommodations,
         departments=departments,
         selected_acc=acc_filter,
         department_summary=department_summary,
-        countries=countries_data
+        countries=get_countries(),
+        countries_version=get_countries_version(),
+        employees_version=employees_version
     )
 
 @acc_bp.route('/download_data', methods=['POST'])
 def download_data():
-    filtered_data = all_employees
+    import pandas as pd
     acc_filter = request.form.get('filter_accommodation')
     status_filter = request.form.get('filter_status')
     dept_filter = request.form.get('filter_department')
 
+    roster = get_roster_columns()
+    if roster is not None:
+        mask = roster.scope(allowed_scope())
+        for key, value in (('Accommodation', acc_filter), ('Status', status_filter), ('Department', dept_filter)):
+            if value:
+                mask = mask & roster.equals(key, value)
+        if not mask.any():
+            flash('No data found for the selected filters.')
+            return redirect(url_for('acc_bp.accommodation_data'))
+        return xlsx_report(roster.to_frame(mask))
+
+    version = employees_guard.refresh()
+    filtered_data = scoped_records(get_employees(), 'employees', field='Accommodation', version=version)
     if acc_filter:
         filtered_data = [d for d in filtered_data if d.get('Accommodation') == acc_filter]
     if status_filter:
@@ -64,13 +97,10 @@ def download_data():
         flash('No data found for the selected filters.')
         return redirect(url_for('acc_bp.accommodation_data'))
 
-    df = pd.DataFrame(filtered_data)
-    
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Report')
-    writer.close()
-    output.seek(0)
+    return xlsx_report(pd.DataFrame(employees_to_records(filtered_data)))
+
+def xlsx_report(df):
+    output = dataframe_to_xlsx(df, 'Report')
 
     return Response(
         output,
@@ -1,7 +1,11 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, flash, current_app, send_from_directory
-from werkzeug.utils import secure_filename
-from routes.staff_routes import all_employees
-from utils.permissions import can_modify
+from flask import Blueprint, render_template, session, redirect, url_for, request, flash, current_app
+from routes.staff_routes import get_employees
+from utils.permissions import can_modify, scoped_records
+from utils.metrics import timed, scanned
+from utils.datastore import DatasetGuard, serialized, atomic_write
+from utils.snapshots import load_json
+from utils.preload import freeze_records
+from utils.attachments import save_attachment, send_attachment
 import json
 import os
 import time
@@ -11,16 +15,26 @@ amcs_bp = Blueprint('amcs_bp', __name__)
 DATA_DIR = os.environ.get('RENDER_DATA_DIR', '.')
 DATA_FILE = os.path.join(DATA_DIR, 'amcs_data.json')
 
+@timed('load', dataset='amcs', path=DATA_FILE)
 def load_amcs_data():
     os.makedirs(DATA_DIR, exist_ok=True)
     try:
-        with open(DATA_FILE, 'r') as f: return json.load(f)
+        return load_json(DATA_FILE)
     except (FileNotFoundError, json.JSONDecodeError): return []
 def save_amcs_data(data):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    amcs_guard.commit(lambda: atomic_write(DATA_FILE, data))
 
-all_amcs = load_amcs_data()
+all_amcs = []
+
+def reload_amcs(frozen=False):
+    global all_amcs
+    all_amcs = freeze_records(load_amcs_data()) if frozen else load_amcs_data()
+
+amcs_guard = DatasetGuard(DATA_FILE, reload=reload_amcs, group_commit=True)
+
+def get_amcs():
+    amcs_guard.ensure_loaded()
+    return all_amcs
 
 @amcs_bp.route('/amcs')
 def amcs_report():
@@ -31,10 +45,12 @@ def amcs_report():
     allowed = session.get('allowed_accommodations', [])
     
     if role in ['Admin', 'Manager']:
-        data_to_process = all_amcs
-        accommodations = sorted(list(set(emp['Accommodation'] for emp in all_employees)))
+        data_to_process = get_amcs()
+        accommodations = sorted(list(set(emp['Accommodation'] for emp in scanned(get_employees(), 'employees'))))
     else:
-        data_to_process = [amc for amc in all_amcs if amc.get('accommodation') in allowed]
+        # refresh first, so the partitions are built from the copy that version describes
+        version = amcs_guard.refresh()
+        data_to_process = scoped_records(get_amcs(), 'amcs', version=version)
         accommodations = allowed
 
     vendor_filter = request.args.get('vendor')
@@ -43,14 +59,14 @@ def amcs_report():
 
     amcs_to_show = data_to_process
     if vendor_filter:
-        amcs_to_show = [a for a in amcs_to_show if a.get('vendor') == vendor_filter]
+        amcs_to_show = [a for a in scanned(amcs_to_show, 'amcs', 'filter') if a.get('vendor') == vendor_filter]
     if type_filter:
-        amcs_to_show = [a for a in amcs_to_show if a.get('type') == type_filter]
+        amcs_to_show = [a for a in scanned(amcs_to_show, 'amcs', 'filter') if a.get('type') == type_filter]
     if accommodation_filter:
-        amcs_to_show = [a for a in amcs_to_show if a.get('accommodation') == accommodation_filter]
-    
-    vendors = sorted(list(set(a.get('vendor') for a in data_to_process if a.get('vendor'))))
-    types = sorted(list(set(a.get('type') for a in data_to_process if a.get('type'))))
+        amcs_to_show = [a for a in scanned(amcs_to_show, 'amcs', 'filter') if a.get('accommodation') == accommodation_filter]
+
+    vendors = sorted(list(set(a.get('vendor') for a in scanned(data_to_process, 'amcs', 'filter') if a.get('vendor'))))
+    types = sorted(list(set(a.get('type') for a in scanned(data_to_process, 'amcs', 'filter') if a.get('type'))))
 
     return render_template('amcs.html', 
                            amcs_records=amcs_to_show, 
@@ -59,6 +75,7 @@ def amcs_report():
                            accommodations=accommodations)
 
 @amcs_bp.route('/add_amc', methods=['POST'])
+@serialized(amcs_guard)
 def add_amc():
     form_data = request.form
     accommodation = form_data.get('accommodation_name')
@@ -70,10 +87,7 @@ def add_amc():
     
     filename = None
     if file and file.filename:
-        safe_filename = secure_filename(file.filename)
-        filename = f"{int(time.time())}_{safe_filename}"
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        filename = save_attachment(file, current_app.config['UPLOAD_FOLDER'])
 
     new_amc = {
         'id': int(time.time() * 1000), 'accommodation': accommodation,
@@ -91,4 +105,4 @@ def add_amc():
 def uploaded_file(filename):
     if 'username' not in session:
         return redirect(url_for('auth_bp.login'))
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
\ No newline at end of file
+    return send_attachment(current_app.config['UPLOAD_FOLDER'], filename)
\ No newline at end of file
@@ -1,28 +1,41 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash, jsonify, Response
-from routes.staff_routes import all_employees
-from utils.permissions import can_modify
+from routes.staff_routes import get_employees
+from utils.permissions import can_modify, scoped_records
+from utils.exports import dataframe_to_xlsx
+from utils.metrics import timed, scanned
+from utils.datastore import DatasetGuard, serialized, atomic_write
+from utils.snapshots import load_json
+from utils.preload import freeze_records
+from utils.http_cache import etag_from_datasets
 import json
 import os
 import time
-import pandas as pd
-import io
 
 assets_bp = Blueprint('assets_bp', __name__)
 
 DATA_FILE = 'assets_data.json'
 
+@timed('load', dataset='assets', path=DATA_FILE)
 def load_assets_data():
     try:
-        with open(DATA_FILE, 'r') as f:
-            return json.load(f)
+        return load_json(DATA_FILE)
     except (FileNotFoundError, json.JSONDecodeError):
         return []
 
 def save_assets_data(data):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    assets_guard.commit(lambda: atomic_write(DATA_FILE, data))
 
-all_assets = load_assets_data()
+all_assets = []
+
+def reload_assets(frozen=False):
+    global all_assets
+    all_assets = freeze_records(load_assets_data()) if frozen else load_assets_data()
+
+assets_guard = DatasetGuard(DATA_FILE, reload=reload_assets, group_commit=True)
+
+def get_assets():
+    assets_guard.ensure_loaded()
+    return all_assets
 
 @assets_bp.route('/assets')
 def assets_report():
@@ -33,25 +46,28 @@ def assets_report():
     allowed = session.get('allowed_accommodations', [])
     
     if role in ['Admin', 'Manager']:
-        data_to_process = all_assets
-        accommodations = sorted(list(set(emp['Accommodation'] for emp in all_employees)))
+        data_to_process = get_assets()
+        accommodations = sorted(list(set(emp['Accommodation'] for emp in scanned(get_employees(), 'employees'))))
     else:
-        data_to_process = [asset for asset in all_assets if asset.get('accommodation') in allowed]
+        # refresh first, so the partitions are built from the copy that version describes
+        version = assets_guard.refresh()
+        data_to_process = scoped_records(get_assets(), 'assets', version=version)
         accommodations = allowed
     
     status_filter = request.args.get('status')
     assets_to_show = data_to_process
     if status_filter:
-        assets_to_show = [asset for asset in data_to_process if asset.get('status') == status_filter]
+        assets_to_show = [asset for asset in scanned(data_to_process, 'assets', 'filter') if asset.get('status') == status_filter]
 
     stats = {
-        'Available': sum(asset.get('quantity', 0) for asset in data_to_process if asset.get('status') == 'Available'),
-        'Scrap': sum(asset.get('quantity', 0) for asset in data_to_process if asset.get('status') == 'Scrap')
+        'Available': sum(asset.get('quantity', 0) for asset in scanned(data_to_process, 'assets', 'filter') if asset.get('status') == 'Available'),
+        'Scrap': sum(asset.get('quantity', 0) for asset in scanned(data_to_process, 'assets', 'filter') if asset.get('status') == 'Scrap')
     }
     
     return render_template('assets.html', assets=assets_to_show, stats=stats, accommodations=accommodations)
 
 @assets_bp.route('/add_asset', methods=['POST'])
+@serialized(assets_guard)
 def add_asset():
     form_data = request.form
     accommodation = form_data.get('accommodation')
@@ -82,13 +98,16 @@ def add_asset():
     return redirect(url_for('assets_bp.assets_report'))
 
 @assets_bp.route('/get_assets/<accommodation_name>/<status>')
+@etag_from_datasets(assets_guard)
 def get_assets_by_status(accommodation_name, status):
     if 'username' not in session: return jsonify({"error": "Unauthorized"}), 401
     
-    assets_in_accom = [asset['asset_name'] for asset in all_assets if asset.get('accommodation') == accommodation_name and asset.get('status') == status]
+    assets = get_assets()
+    assets_in_accom = [asset['asset_name'] for asset in scanned(assets, 'assets', 'filter') if asset.get('accommodation') == accommodation_name and asset.get('status') == status]
     return jsonify(sorted(list(set(assets_in_accom))))
 
 @assets_bp.route('/shift_asset', methods=['POST'])
+@serialized(assets_guard)
 def shift_asset():
     global all_assets
     form_data = request.form
@@ -100,7 +119,7 @@ def shift_asset():
     if not can_modify(source_acc) or not can_modify(target_acc):
         return redirect(url_for('assets_bp.assets_report'))
     
-    source_asset = next((asset for asset in all_assets if asset.get('accommodation') == source_acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Available'), None)
+    source_asset = next((asset for asset in scanned(all_assets, 'assets') if asset.get('accommodation') == source_acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Available'), None)
 
     if not source_asset or source_asset['quantity'] < quantity_to_shift:
         flash("Not enough quantity in source accommodation to shift.")
@@ -108,7 +127,7 @@ def shift_asset():
 
     source_asset['quantity'] -= quantity_to_shift
     
-    target_asset = next((asset for asset in all_assets if asset.get('accommodation') == target_acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Available'), None)
+    target_asset = next((asset for asset in scanned(all_assets, 'assets') if asset.get('accommodation') == target_acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Available'), None)
     if target_asset:
         target_asset['quantity'] += quantity_to_shift
     else:
@@ -119,13 +138,14 @@ def shift_asset():
         }
         all_assets.append(new_asset)
 
-    all_assets = [asset for asset in all_assets if asset.get('quantity') > 0]
+    all_assets = [asset for asset in scanned(all_assets, 'assets') if asset.get('quantity') > 0]
     
     save_assets_data(all_assets)
     flash(f"Successfully shifted {quantity_to_shift} of {asset_name}.")
     return redirect(url_for('assets_bp.assets_report'))
 
 @assets_bp.route('/scrap_asset', methods=['POST'])
+@serialized(assets_guard)
 def scrap_asset():
     global all_assets
     form_data = request.form
@@ -136,7 +156,7 @@ def scrap_asset():
     if not can_modify(acc):
         return redirect(url_for('assets_bp.assets_report'))
 
-    source_asset = next((asset for asset in all_assets if asset.get('accommodation') == acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Available'), None)
+    source_asset = next((asset for asset in scanned(all_assets, 'assets') if asset.get('accommodation') == acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Available'), None)
 
     if not source_asset or source_asset['quantity'] < quantity_to_scrap:
         flash("Not enough quantity in available assets to scrap.")
@@ -144,7 +164,7 @@ def scrap_asset():
     
     source_asset['quantity'] -= quantity_to_scrap
     
-    scrap_asset_record = next((asset for asset in all_assets if asset.get('accommodation') == acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Scrap'), None)
+    scrap_asset_record = next((asset for asset in scanned(all_assets, 'assets') if asset.get('accommodation') == acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Scrap'), None)
     
     if scrap_asset_record:
         scrap_asset_record['quantity'] += quantity_to_scrap
@@ -158,13 +178,14 @@ def scrap_asset():
         }
         all_assets.append(new_scrap_asset)
 
-    all_assets = [asset for asset in all_assets if asset.get('quantity') > 0]
+    all_assets = [asset for asset in scanned(all_assets, 'assets') if asset.get('quantity') > 0]
     
     save_assets_data(all_assets)
     flash(f"Successfully moved {quantity_to_scrap} of {asset_name} to scrap.")
     return redirect(url_for('assets_bp.assets_report'))
 
 @assets_bp.route('/remove_scrap', methods=['POST'])
+@serialized(assets_guard)
 def remove_scrap():
     global all_assets
     form_data = request.form
@@ -175,7 +196,7 @@ def remove_scrap():
     if not can_modify(acc):
         return redirect(url_for('assets_bp.assets_report'))
 
-    scrap_asset = next((asset for asset in all_assets if asset.get('accommodation') == acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Scrap'), None)
+    scrap_asset = next((asset for asset in scanned(all_assets, 'assets') if asset.get('accommodation') == acc and asset.get('asset_name') == asset_name and asset.get('status') == 'Scrap'), None)
 
     if not scrap_asset or scrap_asset['quantity'] < quantity_to_remove:
         flash("Not enough quantity in scrap to remove.")
@@ -183,7 +204,7 @@ def remove_scrap():
     
     scrap_asset['quantity'] -= quantity_to_remove
     
-    all_assets = [asset for asset in all_assets if asset.get('quantity') > 0]
+    all_assets = [asset for asset in scanned(all_assets, 'assets') if asset.get('quantity') > 0]
 
     save_assets_data(all_assets)
     flash(f"Successfully removed {quantity_to_remove} of {asset_name} from scrap.")
@@ -191,30 +212,29 @@ def remove_scrap():
 
 @assets_bp.route('/download_assets_report', methods=['POST'])
 def download_assets_report():
+    import pandas as pd
     role = session.get('role')
     allowed = session.get('allowed_accommodations', [])
     
     if role in ['Admin', 'Manager']:
-        data_to_process = all_assets
+        data_to_process = get_assets()
     else:
-        data_to_process = [asset for asset in all_assets if asset.get('accommodation') in allowed]
+        # refresh first, so the partitions are built from the copy that version describes
+        version = assets_guard.refresh()
+        data_to_process = scoped_records(get_assets(), 'assets', version=version)
 
     status_filter = request.form.get('hidden_status')
 
     filtered_assets = data_to_process
     if status_filter:
-        filtered_assets = [asset for asset in filtered_assets if asset.get('status') == status_filter]
+        filtered_assets = [asset for asset in scanned(filtered_assets, 'assets', 'filter') if asset.get('status') == status_filter]
     
     if not filtered_assets:
         flash("No data found for the selected filters to download.")
         return redirect(url_for('assets_bp.assets_report'))
         
     df = pd.DataFrame(filtered_assets)
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Assets_Report')
-    writer.close()
-    output.seek(0)
+    output = dataframe_to_xlsx(df, 'Assets_Report')
     
     return Response(
         output,
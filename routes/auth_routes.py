@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session
-from routes.staff_routes import all_employees
-from routes.settings_routes import load_users
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session, current_app
+from routes.staff_routes import get_employees, get_roster_columns
+from utils.user_directory import authenticate, login_throttled, record_login_attempt
+from utils.session_store import regenerate_session
+from collections import Counter
 
 auth_bp = Blueprint('auth_bp', __name__)
 
@@ -12,15 +14,19 @@ def login():
 def login_action():
     username = request.form.get('username')
     password = request.form.get('password')
-    users = load_users()
-    
-    user_found = None
-    for user in users:
-        if user.get('username') == username and user.get('password') == password:
-            user_found = user
-            break
-            
+    client_ip = request.remote_addr
+
+    if login_throttled(username, client_ip):
+        flash('Too many failed login attempts. Please wait a few minutes and try again.')
+        return redirect(url_for('auth_bp.login'))
+
+    user_found = authenticate(username, password)
+    record_login_attempt(username, client_ip, user_found is not None)
+
     if user_found:
+        # a fresh session id on login, so an id planted before authentication is never promoted
+        session.clear()
+        regenerate_session(current_app, session)
         session['username'] = user_found['username']
         session['role'] = user_found.get('role', 'User') # Default role if not specified
         session['allowed_accommodations'] = user_found.get('allowed_accommodations', [])
@@ -37,9 +43,23 @@ def dashboard():
     search_query = request.args.get('search', '').lower()
     location_filter = request.args.get('location')
     status_filter = request.args.get('status')
-    
-    valid_employee_statuses = ['Active', 'Vacation', 'Resigned', 'Terminated']
-    employee_rows = [e for e in all_employees if e.get('Status') in valid_employee_statuses]
+
+    roster = get_roster_columns()
+    if roster is not None:
+        employees_to_show, locations, stats = columnar_dashboard(roster, search_query, status_filter, location_filter)
+    else:
+        employees_to_show, locations, stats = list_dashboard(get_employees(), search_query, status_filter, location_filter)
+
+    return render_template('dashboard.html', 
+                           username=session.get('username'), 
+                           employees=employees_to_show,
+                           locations=locations,
+                           stats=stats)
+
+VALID_EMPLOYEE_STATUSES = ['Active', 'Vacation', 'Resigned', 'Terminated']
+
+def list_dashboard(employees, search_query, status_filter, location_filter):
+    employee_rows = [e for e in employees if e.get('Status') in VALID_EMPLOYEE_STATUSES]
     
     employees_to_show = employee_rows
 
@@ -52,7 +72,7 @@ def dashboard():
 
     if status_filter:
         if status_filter == 'Vacant':
-            employees_to_show = [e for e in all_employees if e.get('Status') == 'Vacant']
+            employees_to_show = [e for e in employees if e.get('Status') == 'Vacant']
         else:
             employees_to_show = [emp for emp in employees_to_show if emp.get('Status') == status_filter]
     
@@ -61,20 +81,41 @@ def dashboard():
 
     locations = {}
     if employee_rows:
-        locations = {emp['Accommodation']: sum(1 for e in employee_rows if e.get('Accommodation') == emp.get('Accommodation')) for emp in employee_rows if emp.get('Accommodation') != 'N/A'}
+        location_counts = Counter(e.get('Accommodation') for e in employee_rows)
+        locations = {emp['Accommodation']: location_counts[emp.get('Accommodation')] for emp in employee_rows if emp.get('Accommodation') != 'N/A'}
     
     stats = {
         "total": len(employee_rows),
-        "vacant": sum(1 for e in all_employees if e.get('Status') == 'Vacant'),
+        "vacant": sum(1 for e in employees if e.get('Status') == 'Vacant'),
         "on_vacation": sum(1 for e in employee_rows if e.get('Status') == 'Vacation'),
         "resigned": sum(1 for e in employee_rows if e.get('Status') == 'Resigned')
     }
-    
-    return render_template('dashboard.html', 
-                           username=session.get('username'), 
-                           employees=employees_to_show,
-                           locations=locations,
-                           stats=stats)
+    return employees_to_show, locations, stats
+
+def columnar_dashboard(roster, search_query, status_filter, location_filter):
+    # Same rows, counts and ordering as list_dashboard, as boolean masks over the roster columns
+    employee_mask = roster.isin('Status', VALID_EMPLOYEE_STATUSES)
+    vacant_mask = roster.equals('Status', 'Vacant')
+    shown = employee_mask
+
+    if search_query:
+        shown = shown & (roster.contains('SAP ID', search_query) | roster.contains('Emp Name', search_query))
+
+    if status_filter:
+        shown = vacant_mask if status_filter == 'Vacant' else shown & roster.equals('Status', status_filter)
+
+    if location_filter:
+        shown = shown & roster.equals('Accommodation', location_filter)
+
+    locations = {location: count for location, count in roster.counts('Accommodation', employee_mask).items() if location != 'N/A'}
+
+    stats = {
+        "total": roster.count(employee_mask),
+        "vacant": roster.count(vacant_mask),
+        "on_vacation": roster.count(employee_mask & roster.equals('Status', 'Vacation')),
+        "resigned": roster.count(employee_mask & roster.equals('Status', 'Resigned'))
+    }
+    return roster.rows(shown), locations, stats
 
 @auth_bp.route('/logout')
 def logout():
@@ -1,22 +1,30 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, flash, current_app, send_from_directory
-from werkzeug.utils import secure_filename
-from routes.staff_routes import all_employees
+from flask import Blueprint, render_template, session, redirect, url_for, request, flash, current_app
+from routes.staff_routes import get_employees
+from utils.permissions import allowed_scope
+from utils.metrics import timed, scanned, name_dataset
+from utils.datastore import DatasetGuard, serialized, atomic_write
+from utils.snapshots import load_json
+from utils.attachments import save_attachment, release_attachment, send_attachment
 import json
-import os
 import time
 
 contracts_bp = Blueprint('contracts_bp', __name__)
 
 TYPES_FILE = 'contract_types.json'
 CONTRACTS_FILE = 'contracts_data.json'
+name_dataset(CONTRACTS_FILE, 'contracts')
 
+@timed('load')
 def load_data(file_path):
     try:
-        with open(file_path, 'r') as f: return json.load(f)
+        return load_json(file_path)
     except (FileNotFoundError, json.JSONDecodeError): return []
 
 def save_data(data, file_path):
-    with open(file_path, 'w') as f: json.dump(data, f, indent=4)
+    atomic_write(file_path, data)
+
+types_guard = DatasetGuard(TYPES_FILE)
+contracts_guard = DatasetGuard(CONTRACTS_FILE)
 
 @contracts_bp.route('/contracts')
 def contracts_report():
@@ -31,9 +39,11 @@ def contracts_report():
 
     if role in ['Admin', 'Manager']:
         contracts_to_show = all_contracts
-        accommodations = sorted(list(set(emp['Accommodation'] for emp in all_employees)))
+        accommodations = sorted(list(set(emp['Accommodation'] for emp in scanned(get_employees(), 'employees'))))
     else:
-        contracts_to_show = [c for c in all_contracts if c.get('accommodation') in allowed]
+        # contracts are read from the file per request, so there is no partition worth caching
+        allowed_set = allowed_scope()
+        contracts_to_show = [c for c in scanned(all_contracts, 'contracts', 'filter') if c.get('accommodation') in allowed_set]
         accommodations = allowed
     
     return render_template('contracts.html', 
@@ -42,6 +52,7 @@ def contracts_report():
                            contract_types=contract_types)
 
 @contracts_bp.route('/add_contract_type', methods=['POST'])
+@serialized(types_guard)
 def add_contract_type():
     if session.get('role') not in ['Admin', 'Manager']:
         flash("Access Denied.")
@@ -58,6 +69,7 @@ def add_contract_type():
     return redirect(url_for('contracts_bp.contracts_report'))
 
 @contracts_bp.route('/add_contract', methods=['POST'])
+@serialized(contracts_guard)
 def add_contract():
     if session.get('role') not in ['Admin', 'Manager']:
         flash("Access Denied.")
@@ -68,10 +80,7 @@ def add_contract():
     
     filename = None
     if file and file.filename:
-        safe_filename = secure_filename(file.filename)
-        filename = f"{int(time.time())}_{safe_filename}"
-        file_path = os.path.join(current_app.config['CONTRACTS_UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        filename = save_attachment(file, current_app.config['CONTRACTS_UPLOAD_FOLDER'])
     
     new_contract = {
         'id': int(time.time() * 1000),
@@ -88,22 +97,23 @@ def add_contract():
     return redirect(url_for('contracts_bp.contracts_report'))
 
 @contracts_bp.route('/delete_contract/<contract_id>', methods=['POST'])
+@serialized(contracts_guard)
 def delete_contract(contract_id):
     if session.get('role') not in ['Admin', 'Manager']:
         flash("Access Denied.")
         return redirect(url_for('contracts_bp.contracts_report'))
         
     all_contracts = load_data(CONTRACTS_FILE)
-    contract_to_delete = next((c for c in all_contracts if str(c.get('id')) == str(contract_id)), None)
+    contract_to_delete = next((c for c in scanned(all_contracts, 'contracts') if str(c.get('id')) == str(contract_id)), None)
     
     if contract_to_delete:
         if contract_to_delete.get('attachment'):
             try:
-                os.remove(os.path.join(current_app.config['CONTRACTS_UPLOAD_FOLDER'], contract_to_delete['attachment']))
+                release_attachment(contract_to_delete['attachment'], current_app.config['CONTRACTS_UPLOAD_FOLDER'])
             except OSError as e:
                 flash(f"Error deleting file: {e}")
         
-        all_contracts = [c for c in all_contracts if str(c.get('id')) != str(contract_id)]
+        all_contracts = [c for c in scanned(all_contracts, 'contracts') if str(c.get('id')) != str(contract_id)]
         save_data(all_contracts, CONTRACTS_FILE)
         flash("Contract deleted successfully.")
     else:
@@ -115,4 +125,4 @@ def delete_contract(contract_id):
 def uploaded_contract_file(filename):
     if 'username' not in session:
         return redirect(url_for('auth_bp.login'))
-    return send_from_directory(current_app.config['CONTRACTS_UPLOAD_FOLDER'], filename)
\ No newline at end of file
+    return send_attachment(current_app.config['CONTRACTS_UPLOAD_FOLDER'], filename)
\ No newline at end of file
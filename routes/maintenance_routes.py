@@ -1,28 +1,41 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash, Response
-from routes.staff_routes import all_employees
-from utils.permissions import can_modify
+from routes.staff_routes import get_employees
+from utils.permissions import can_modify, scoped_records
+from utils.exports import dataframe_to_xlsx
+from utils.metrics import timed, scanned
+from utils.datastore import DatasetGuard, serialized, is_stale, atomic_write
+from utils.snapshots import load_json
+from utils.preload import freeze_records
 import json
 import os
 import time
-import pandas as pd
-import io
 
 maintenance_bp = Blueprint('maintenance_bp', __name__)
 
 DATA_DIR = os.environ.get('RENDER_DATA_DIR', '.')
 DATA_FILE = os.path.join(DATA_DIR, 'maintenance_data.json')
 
+@timed('load', dataset='maintenance', path=DATA_FILE)
 def load_maintenance_data():
     os.makedirs(DATA_DIR, exist_ok=True)
     try:
-        with open(DATA_FILE, 'r') as f: return json.load(f)
+        return load_json(DATA_FILE)
     except (FileNotFoundError, json.JSONDecodeError): return []
 
 def save_maintenance_data(data):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    maintenance_guard.commit(lambda: atomic_write(DATA_FILE, data))
 
-all_issues = load_maintenance_data()
+all_issues = []
+
+def reload_issues(frozen=False):
+    global all_issues
+    all_issues = freeze_records(load_maintenance_data()) if frozen else load_maintenance_data()
+
+maintenance_guard = DatasetGuard(DATA_FILE, reload=reload_issues, group_commit=True)
+
+def get_issues():
+    maintenance_guard.ensure_loaded()
+    return all_issues
 
 @maintenance_bp.route('/maintenance')
 def maintenance_report():
@@ -33,10 +46,12 @@ def maintenance_report():
     allowed = session.get('allowed_accommodations', [])
     
     if role in ['Admin', 'Manager']:
-        data_to_process = all_issues
-        accommodations = sorted(list(set(emp['Accommodation'] for emp in all_employees)))
+        data_to_process = get_issues()
+        accommodations = sorted(list(set(emp['Accommodation'] for emp in scanned(get_employees(), 'employees'))))
     else:
-        data_to_process = [issue for issue in all_issues if issue.get('accommodation') in allowed]
+        # refresh first, so the partitions are built from the copy that version describes
+        version = maintenance_guard.refresh()
+        data_to_process = scoped_records(get_issues(), 'maintenance', version=version)
         accommodations = allowed
 
     status_filter = request.args.get('status')
@@ -44,19 +59,20 @@ def maintenance_report():
     
     issues_to_show = data_to_process
     if status_filter:
-        issues_to_show = [issue for issue in issues_to_show if issue.get('status') == status_filter]
+        issues_to_show = [issue for issue in scanned(issues_to_show, 'maintenance', 'filter') if issue.get('status') == status_filter]
     if accommodation_filter:
-        issues_to_show = [issue for issue in issues_to_show if issue.get('accommodation') == accommodation_filter]
+        issues_to_show = [issue for issue in scanned(issues_to_show, 'maintenance', 'filter') if issue.get('accommodation') == accommodation_filter]
 
     stats = {
-        'Open': sum(1 for issue in data_to_process if issue.get('status') == 'Open'),
-        'In-Process': sum(1 for issue in data_to_process if issue.get('status') == 'In-Process'),
-        'Closed': sum(1 for issue in data_to_process if issue.get('status') == 'Closed')
+        'Open': sum(1 for issue in scanned(data_to_process, 'maintenance', 'filter') if issue.get('status') == 'Open'),
+        'In-Process': sum(1 for issue in scanned(data_to_process, 'maintenance', 'filter') if issue.get('status') == 'In-Process'),
+        'Closed': sum(1 for issue in scanned(data_to_process, 'maintenance', 'filter') if issue.get('status') == 'Closed')
     }
     
     return render_template('maintenance.html', issues=issues_to_show, stats=stats, accommodations=accommodations)
 
 @maintenance_bp.route('/add_issue', methods=['POST'])
+@serialized(maintenance_guard)
 def add_issue():
     form_data = request.form
     accommodation = form_data.get('accommodation')
@@ -78,6 +94,7 @@ def add_issue():
     return redirect(url_for('maintenance_bp.maintenance_report'))
 
 @maintenance_bp.route('/update_issue/<issue_id>', methods=['POST'])
+@serialized(maintenance_guard)
 def update_issue(issue_id):
     form_data = request.form
     accommodation = form_data.get('accommodation')
@@ -87,6 +104,8 @@ def update_issue(issue_id):
     global all_issues
     for issue in all_issues:
         if str(issue.get('id')) == str(issue_id):
+            if is_stale(issue, form_data.get('record_version')):
+                return redirect(url_for('maintenance_bp.maintenance_report'))
             issue.update({
                 'accommodation': accommodation, 'block': form_data.get('block'), 
                 'section': form_data.get('section'), 'report_date': form_data.get('report_date'),
@@ -102,10 +121,11 @@ def update_issue(issue_id):
     return redirect(url_for('maintenance_bp.maintenance_report'))
 
 @maintenance_bp.route('/delete_issue/<issue_id>', methods=['POST'])
+@serialized(maintenance_guard)
 def delete_issue(issue_id):
     global all_issues
     
-    issue_to_delete = next((issue for issue in all_issues if str(issue.get('id')) == str(issue_id)), None)
+    issue_to_delete = next((issue for issue in scanned(all_issues, 'maintenance') if str(issue.get('id')) == str(issue_id)), None)
 
     if not issue_to_delete:
         flash(f"Error: Could not find issue #{issue_id}.")
@@ -114,14 +134,16 @@ def delete_issue(issue_id):
     if not can_modify(issue_to_delete.get('accommodation')):
         return redirect(url_for('maintenance_bp.maintenance_report'))
     
-    all_issues = [issue for issue in all_issues if str(issue.get('id')) != str(issue_id)]
+    all_issues = [issue for issue in scanned(all_issues, 'maintenance') if str(issue.get('id')) != str(issue_id)]
     save_maintenance_data(all_issues)
     flash(f"Issue #{issue_id} deleted successfully!")
         
     return redirect(url_for('maintenance_bp.maintenance_report'))
 
 @maintenance_bp.route('/upload_maintenance_issues', methods=['POST'])
+@serialized(maintenance_guard)
 def upload_maintenance_issues():
+    import pandas as pd
     global all_issues
     if 'maintenance_file' not in request.files:
         flash('No file part in the request.')
@@ -156,33 +178,32 @@ def upload_maintenance_issues():
 
 @maintenance_bp.route('/download_maintenance_report', methods=['POST'])
 def download_maintenance_report():
+    import pandas as pd
     role = session.get('role')
     allowed = session.get('allowed_accommodations', [])
     
     if role in ['Admin', 'Manager']:
-        data_to_process = all_issues
+        data_to_process = get_issues()
     else:
-        data_to_process = [issue for issue in all_issues if issue.get('accommodation') in allowed]
+        # refresh first, so the partitions are built from the copy that version describes
+        version = maintenance_guard.refresh()
+        data_to_process = scoped_records(get_issues(), 'maintenance', version=version)
 
     status_filter = request.form.get('hidden_status')
     accommodation_filter = request.form.get('hidden_accommodation')
 
     filtered_issues = data_to_process
     if status_filter:
-        filtered_issues = [issue for issue in filtered_issues if issue.get('status') == status_filter]
+        filtered_issues = [issue for issue in scanned(filtered_issues, 'maintenance', 'filter') if issue.get('status') == status_filter]
     if accommodation_filter:
-        filtered_issues = [issue for issue in filtered_issues if issue.get('accommodation') == accommodation_filter]
+        filtered_issues = [issue for issue in scanned(filtered_issues, 'maintenance', 'filter') if issue.get('accommodation') == accommodation_filter]
     
     if not filtered_issues:
         flash("No data found for the selected filters to download.")
         return redirect(url_for('maintenance_bp.maintenance_report'))
         
     df = pd.DataFrame(filtered_issues)
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Maintenance_Report')
-    writer.close()
-    output.seek(0)
+    output = dataframe_to_xlsx(df, 'Maintenance_Report')
     
     return Response(
         output,
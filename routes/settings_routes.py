@@ -1,10 +1,14 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, flash
+from flask import Blueprint, render_template, session, redirect, url_for, request, flash, current_app, send_from_directory
 from functools import wraps
-import json
-from routes.staff_routes import all_employees
+from routes.staff_routes import get_employees, employees_guard
+from utils.user_directory import users_guard, users_version, load_users, save_users, hash_password
+from utils.datastore import serialized
+from utils.session_store import revoke_user_sessions
+from utils.profiler import PROFILE_DIR, PROFILE_PARAM, SAMPLING_AVAILABLE, list_profiles
+from utils.metrics import SLOW_OPERATION_MS, slow_operation_summary
+import os
 
 settings_bp = Blueprint('settings_bp', __name__)
-USERS_FILE = 'users.json'
 
 def admin_required(f):
     @wraps(f)
@@ -15,28 +19,21 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def load_users():
-    try:
-        with open(USERS_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
-
-def save_users(users):
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=4)
-
 @settings_bp.route('/settings')
 def settings_page():
     if 'username' not in session:
         return redirect(url_for('auth_bp.login'))
     
+    # versions of the copies rendered below, taken before reading them
+    versions = users_version(), employees_guard.refresh()
     users = load_users()
-    accommodations = sorted(list(set(emp['Accommodation'] for emp in all_employees)))
-    return render_template('settings.html', users=users, accommodations=accommodations)
+    accommodations = sorted(list(set(emp['Accommodation'] for emp in get_employees())))
+    return render_template('settings.html', users=users, accommodations=accommodations,
+                           users_version=versions[0], accommodations_version=versions[1])
 
 @settings_bp.route('/add_user', methods=['POST'])
 @admin_required
+@serialized(users_guard)
 def add_user():
     users = load_users()
     form_data = request.form
@@ -49,7 +46,7 @@ def add_user():
     new_user = {
         "username": username,
         "email": form_data.get('email'),
-        "password": form_data.get('password'),
+        "password": hash_password(form_data.get('password')),
         "role": form_data.get('role'),
         "allowed_accommodations": request.form.getlist('allowed_accommodations')
     }
@@ -67,11 +64,12 @@ def edit_user(username):
         flash("User not found.")
         return redirect(url_for('settings_bp.settings_page'))
 
-    accommodations = sorted(list(set(emp['Accommodation'] for emp in all_employees)))
+    accommodations = sorted(list(set(emp['Accommodation'] for emp in get_employees())))
     return render_template('edit_user.html', user=user_to_edit, accommodations=accommodations)
 
 @settings_bp.route('/update_user/<username>', methods=['POST'])
 @admin_required
+@serialized(users_guard)
 def update_user(username):
     users = load_users()
     form_data = request.form
@@ -84,9 +82,10 @@ def update_user(username):
             
             new_password = form_data.get('password')
             if new_password:
-                user['password'] = new_password
+                user['password'] = hash_password(new_password)
             
             save_users(users)
+            revoke_user_sessions(current_app, username)
             flash(f"User '{username}' updated successfully!")
             return redirect(url_for('settings_bp.settings_page'))
             
@@ -95,6 +94,7 @@ def update_user(username):
 
 @settings_bp.route('/delete_user/<username>', methods=['POST'])
 @admin_required
+@serialized(users_guard)
 def delete_user(username):
     if username == 'admin':
         flash("Error: The default admin user cannot be deleted.")
@@ -103,5 +103,22 @@ def delete_user(username):
     users = load_users()
     users = [u for u in users if u['username'] != username]
     save_users(users)
+    revoke_user_sessions(current_app, username)
     flash(f"User '{username}' deleted successfully.")
-    return redirect(url_for('settings_bp.settings_page'))
\ No newline at end of file
+    return redirect(url_for('settings_bp.settings_page'))
+
+@settings_bp.route('/settings/profiles')
+@admin_required
+def profiles_page():
+    return render_template('profiles.html', profiles=list_profiles(), profile_param=PROFILE_PARAM,
+                           sampling_available=SAMPLING_AVAILABLE)
+
+@settings_bp.route('/settings/profiles/<filename>')
+@admin_required
+def download_profile(filename):
+    return send_from_directory(os.path.abspath(PROFILE_DIR), filename, as_attachment=filename.endswith('.prof'))
+
+@settings_bp.route('/settings/slow_operations')
+@admin_required
+def slow_operations_page():
+    return render_template('slow_operations.html', operations=slow_operation_summary(), threshold_ms=SLOW_OPERATION_MS)
@@ -1,57 +1,187 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash, jsonify
-from utils.permissions import can_modify
-import pandas as pd
+from utils.permissions import can_modify, allowed_scope
+from utils.http_cache import etag_from_datasets
+from utils.fragment_cache import dataset_version
+from utils.metrics import timed, measure, scanned
+from utils.datastore import DatasetGuard, serialized, is_stale, atomic_write
+from utils.snapshots import load_json
+from utils.preload import freeze_records
+from utils.roster import Employee, VACANT, ACTIVE, employees_from_records, employees_to_records, column_values
+from utils.columnar import COLUMNAR_ROSTER, ColumnarRoster
+from utils.rooms import RoomInventory, NO_ACCOMMODATION, room_block
 from collections import Counter
+import hashlib
 import json
 import os
+import re
 import time
 
 staff_bp = Blueprint('staff_bp', __name__)
 
 DATA_FILE = 'data.json'
+MAX_BATCH_LOOKUP = int(os.environ.get('MAX_BATCH_LOOKUP', 500))
 
+@timed('load', dataset='employees', path=DATA_FILE)
 def load_data_from_json():
     try:
-        with open(DATA_FILE, 'r') as f:
-            return json.load(f)
+        return employees_from_records(load_json(DATA_FILE))
     except (FileNotFoundError, json.JSONDecodeError):
         return []
 
 def save_data_to_json(data):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    # every roster mutation ends here, so this is what invalidates the derived views
+    _roster_views['generation'] += 1
+    employees_guard.commit(lambda: atomic_write(DATA_FILE, employees_to_records(data)))
 
-all_employees = load_data_from_json()
+all_employees = []
+_roster_views = {'generation': 0}
 
+def reload_employees(frozen=False):
+    global all_employees
+    all_employees = freeze_records(load_data_from_json()) if frozen else load_data_from_json()
+    _roster_views['generation'] += 1
+
+employees_guard = DatasetGuard(DATA_FILE, reload=reload_employees, group_commit=True)
+
+def get_employees():
+    employees_guard.ensure_loaded()
+    return all_employees
+
+_employee_index = {'key': None, 'index': {}}
+
+def sap_key(value):
+    if type(value) is int:
+        return value
+    try:
+        return int(float(value))
+    except (ValueError, TypeError):
+        return None
+
+def get_employee_index():
+    # SAP ID -> record; rebuilt whenever the list is replaced or data.json is saved
+    get_employees()
+    key = (id(all_employees), len(all_employees), dataset_version(DATA_FILE))
+    if _employee_index['key'] != key:
+        index = {}
+        for emp in scanned(all_employees, 'employees'):
+            sap_id = sap_key(emp.get('SAP ID'))
+            if sap_id is not None:
+                index.setdefault(sap_id, emp)
+        _employee_index['key'] = key
+        _employee_index['index'] = index
+    return _employee_index['index']
+
+def roster_view(name, build):
+    # build(all_employees), cached until the list is replaced or saved
+    get_employees()
+    key = (id(all_employees), len(all_employees), _roster_views['generation'])
+    cached = _roster_views.get(name)
+    if cached is None or cached[0] != key:
+        with measure('scan', 'employees', len(all_employees)):
+            cached = _roster_views[name] = (key, build(all_employees))
+    return cached[1]
+
+def get_roster_columns():
+    # ColumnarRoster over the current list, or None when COLUMNAR_ROSTER is off
+    return roster_view('columns', ColumnarRoster) if COLUMNAR_ROSTER else None
+
+def get_room_inventory():
+    return roster_view('rooms', RoomInventory)
+
+def sap_positions(records):
+    # SAP ID -> position of its first row, the same row get_employee_index resolves to
+    positions = {}
+    for position, value in enumerate(column_values(records, 'SAP ID')):
+        sap_id = sap_key(value)
+        if sap_id is not None:
+            positions.setdefault(sap_id, position)
+    return positions
+
+def get_employee_positions():
+    return roster_view('positions', sap_positions)
+
+def find_employee(sap_id):
+    return get_employee_index().get(sap_key(sap_id))
+
+def employee_summary(emp):
+    return {
+        "Emp Name": emp.get('Emp Name'),
+        "Designation": emp.get('Designation'),
+        "Department": emp.get('Department')
+    }
+
+COUNTRIES_FILE = os.path.join(os.path.dirname(__file__), '..', 'static', 'data', 'countries.json')
+
+COUNTRY_CACHE_SECONDS = 7 * 24 * 3600
+
+@timed('load', dataset='countries', path=COUNTRIES_FILE)
 def load_countries_data():
-    file_path = os.path.join(os.path.dirname(__file__), '..', 'static', 'data', 'countries.json')
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with open(COUNTRIES_FILE, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-countries_data = load_countries_data()
+def compile_countries_index(countries):
+    # name -> (sorted states, phone code, etag), built once per worker
+    index = {}
+    for country in countries:
+        states = sorted(state['name'] for state in country.get('states', []))
+        phone_code = country.get('phone_code', '')
+        etag = hashlib.sha1(json.dumps([country['name'], states, phone_code]).encode('utf-8')).hexdigest()
+        index[country['name']] = (states, phone_code, etag)
+    return index
+
+_countries = {}
+
+def get_countries_index():
+    if 'index' not in _countries:
+        # the version of the file as loaded; countries.json is read once per process
+        _countries['version'] = dataset_version(COUNTRIES_FILE)
+        index = compile_countries_index(load_countries_data())
+        _countries['names'] = [{'name': name} for name in index]
+        _countries['index'] = index
+    return _countries['index']
+
+def get_countries():
+    get_countries_index()
+    return _countries['names']
+
+def get_countries_version():
+    get_countries_index()
+    return _countries['version']
 
 @staff_bp.route('/get_employee_details/<sap_id>')
+@etag_from_datasets(employees_guard)
 def get_employee_details(sap_id):
     if 'username' not in session:
         return jsonify({"error": "Unauthorized"}), 401
     
-    employee_details = {}
-    for emp in all_employees:
-        try:
-            if int(float(emp.get('SAP ID'))) == int(float(sap_id)):
-                employee_details = {
-                    "Emp Name": emp.get('Emp Name'),
-                    "Designation": emp.get('Designation'),
-                    "Department": emp.get('Department')
-                }
-                break
-        except (ValueError, TypeError):
-            continue
-    
-    return jsonify(employee_details)
+    emp = find_employee(sap_id)
+    return jsonify(employee_summary(emp) if emp else {})
+
+@staff_bp.route('/get_employees_details', methods=['POST'])
+def get_employees_details():
+    if 'username' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    sap_ids = payload.get('sap_ids') or request.form.getlist('sap_ids')
+    if not isinstance(sap_ids, list):
+        return jsonify({"error": "sap_ids must be a list"}), 400
+    if len(sap_ids) > MAX_BATCH_LOOKUP:
+        return jsonify({"error": f"At most {MAX_BATCH_LOOKUP} sap_ids per request"}), 400
+
+    index = get_employee_index()
+    employees_details = {}
+    for sap_id in sap_ids:
+        emp = index.get(sap_key(sap_id))
+        employees_details[str(sap_id)] = employee_summary(emp) if emp else {}
+    return jsonify(employees_details)
 
 @staff_bp.route('/upload', methods=['POST'])
+@serialized(employees_guard)
 def upload_file():
+    import pandas as pd
     global all_employees
     if 'fileUpload' not in request.files:
         flash('No file part in the request.')
@@ -75,7 +205,7 @@ def upload_file():
                 flash(f'Excel file is missing required columns. Please ensure these columns exist: {required_columns}')
                 return redirect(url_for('acc_bp.accommodation_data'))
 
-            new_data = df.to_dict('records')
+            new_data = employees_from_records(df.to_dict('records'))
             all_employees.clear()
             all_employees.extend(new_data)
             save_data_to_json(all_employees)
@@ -88,7 +218,9 @@ def upload_file():
     return redirect(url_for('acc_bp.accommodation_data'))
 
 @staff_bp.route('/add_accommodation_data', methods=['POST'])
+@serialized(employees_guard)
 def add_accommodation_data():
+    import pandas as pd
     global all_employees
     if 'addAccomFile' not in request.files:
         flash('No file part in the request.')
@@ -103,15 +235,15 @@ def add_accommodation_data():
         try:
             df = pd.read_excel(file).fillna('')
             df.dropna(subset=['SAP ID'], inplace=True)
-            new_data = df.to_dict('records')
+            new_data = employees_from_records(df.to_dict('records'))
 
-            existing_sap_ids = {str(emp.get('SAP ID')) for emp in all_employees}
+            existing_sap_ids = {emp.sap_id for emp in all_employees}
             added_count = 0
             skipped_count = 0
 
             for record in new_data:
-                sap_id = str(record.get('SAP ID'))
-                if sap_id and sap_id not in existing_sap_ids:
+                sap_id = record.sap_id
+                if sap_id != '' and sap_id not in existing_sap_ids:
                     all_employees.append(record)
                     existing_sap_ids.add(sap_id)
                     added_count += 1
@@ -128,6 +260,7 @@ def add_accommodation_data():
     return redirect(url_for('acc_bp.accommodation_data'))
 
 @staff_bp.route('/manage_accommodation', methods=['POST'])
+@serialized(employees_guard)
 def manage_accommodation():
     global all_employees
     form_data = request.form
@@ -140,7 +273,7 @@ def manage_accommodation():
 
     if action == 'remove':
         original_count = len(all_employees)
-        all_employees = [emp for emp in all_employees if emp.get('Accommodation') != source_acc]
+        all_employees[:] = [emp for emp in scanned(all_employees, 'employees') if emp.accommodation != source_acc]
         removed_count = original_count - len(all_employees)
         save_data_to_json(all_employees)
         flash(f"Successfully removed {removed_count} records from {source_acc}.")
@@ -152,8 +285,8 @@ def manage_accommodation():
             return redirect(url_for('acc_bp.accommodation_data'))
         
         shifted_count = 0
-        for emp in all_employees:
-            if emp.get('Accommodation') == source_acc:
+        for emp in scanned(all_employees, 'employees'):
+            if emp.accommodation == source_acc:
                 emp['Accommodation'] = target_acc
                 shifted_count += 1
         save_data_to_json(all_employees)
@@ -166,47 +299,31 @@ def staff_details(sap_id):
     if 'username' not in session:
         return redirect(url_for('auth_bp.login'))
     
-    employee_to_show = None
-    for emp in all_employees:
-        if emp.get('SAP ID'):
-            try:
-                if int(float(emp.get('SAP ID'))) == int(float(sap_id)):
-                    employee_to_show = emp
-                    break
-            except (ValueError, TypeError):
-                continue
-            
+    employee_to_show = find_employee(sap_id)
     if not employee_to_show:
         flash(f"No employee found with SAP ID: {sap_id}")
         return redirect(url_for('auth_bp.dashboard'))
         
     role = session.get('role')
+    get_employees()
     if role in ['Admin', 'Manager']:
-        accommodations = sorted(list(set(emp['Accommodation'] for emp in all_employees if emp.get('Accommodation'))))
+        accommodations = sorted(list(set(emp['Accommodation'] for emp in scanned(all_employees, 'employees') if emp.get('Accommodation'))))
     else:
         accommodations = session.get('allowed_accommodations', [])
-        
-    departments = sorted(list(set(emp.get('Department') for emp in all_employees if emp.get('Department'))))
+
+    departments = sorted(list(set(emp.get('Department') for emp in scanned(all_employees, 'employees') if emp.get('Department'))))
 
     return render_template(
         'staff_details.html',
         employee=employee_to_show,
         accommodations=accommodations,
         departments=departments,
-        countries=countries_data
+        countries=get_countries()
     )
 @staff_bp.route('/update_staff/<sap_id>', methods=['POST'])
+@serialized(employees_guard)
 def update_staff(sap_id):
-    employee_to_update = None
-    for emp in all_employees:
-        if emp.get('SAP ID'):
-            try:
-                if int(float(emp.get('SAP ID'))) == int(float(sap_id)):
-                    employee_to_update = emp
-                    break
-            except (ValueError, TypeError):
-                continue
-
+    employee_to_update = find_employee(sap_id)
     if not employee_to_update:
         flash('Could not find employee to update.')
         return redirect(url_for('auth_bp.dashboard'))
@@ -215,6 +332,9 @@ def update_staff(sap_id):
         return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
     
     form_data = request.form
+    if is_stale(employee_to_update, form_data.get('record_version')):
+        return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
+
     employee_to_update.update({
         'Emp Name': form_data.get('emp_name'),
         'Designation': form_data.get('designation'),
@@ -227,47 +347,42 @@ def update_staff(sap_id):
     return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
 
 @staff_bp.route('/checkout_staff/<sap_id>', methods=['POST'])
+@serialized(employees_guard)
 def checkout_staff(sap_id):
     global all_employees
+    target = sap_key(sap_id)
     for i, emp in enumerate(all_employees):
-        if emp.get('SAP ID'):
-            try:
-                if int(float(emp.get('SAP ID'))) == int(float(sap_id)):
-                    if not can_modify(emp.get('Accommodation')):
-                        return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
-                    
-                    ex_employee_record = emp.copy()
-                    ex_employee_record.update({'Status': 'Checked-Out', 'Accommodation': 'N/A', 'Room': 'N/A'})
-                    
-                    all_employees[i] = {
-                        'Accommodation': emp.get('Accommodation'), 'Room': emp.get('Room'), 'SAP ID': '', 
-                        'Emp Name': '', 'Designation': '', 'Department': '', 'Status': 'Vacant', 'Nationality': ''
-                    }
-                    all_employees.append(ex_employee_record)
-                    save_data_to_json(all_employees)
-                    flash(f"Employee {sap_id} has been checked out.")
-                    return redirect(url_for('auth_bp.dashboard'))
-            except (ValueError, TypeError):
-                continue
-            
+        if target is not None and emp.sap_id == target:
+            if not can_modify(emp.get('Accommodation')):
+                return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
+            if is_stale(emp, request.form.get('record_version')):
+                return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
+
+            ex_employee_record = emp.copy()
+            ex_employee_record.update({'Status': 'Checked-Out', 'Accommodation': 'N/A', 'Room': 'N/A'})
+
+            all_employees[i] = Employee.vacant(emp.get('Accommodation'), emp.get('Room'))
+            all_employees.append(ex_employee_record)
+            save_data_to_json(all_employees)
+            flash(f"Employee {sap_id} has been checked out.")
+            return redirect(url_for('auth_bp.dashboard'))
+
     flash('Could not find employee to check out.')
     return redirect(url_for('auth_bp.dashboard'))
 @staff_bp.route('/shift_staff/<sap_id>', methods=['POST'])
+@serialized(employees_guard)
 def shift_staff(sap_id):
     global all_employees
     
     original_record_index = -1
     employee_data = None
 
-    for i, emp in enumerate(all_employees):
-        if emp.get('SAP ID'):
-            try:
-                if int(float(emp.get('SAP ID'))) == int(float(sap_id)):
-                    original_record_index = i
-                    employee_data = emp.copy()
-                    break
-            except (ValueError, TypeError):
-                continue
+    target = sap_key(sap_id)
+    for i, emp in enumerate(scanned(all_employees, 'employees')):
+        if target is not None and emp.sap_id == target:
+            original_record_index = i
+            employee_data = emp.copy()
+            break
 
     if not employee_data:
         flash('Shift failed. Could not find original employee.')
@@ -275,27 +390,200 @@ def shift_staff(sap_id):
 
     if not can_modify(employee_data.get('Accommodation')):
         return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
+    if is_stale(employee_data, request.form.get('record_version')):
+        return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
     
     new_acc = request.form.get('new_accommodation')
     new_room = request.form.get('new_room')
     
-    target_record_index = next((i for i, emp in enumerate(all_employees) if emp.get('Accommodation') == new_acc and emp.get('Room') == new_room and emp.get('Status') == 'Vacant'), None)
+    target_record_index = next((i for i, emp in enumerate(scanned(all_employees, 'employees')) if emp.status == VACANT and emp.accommodation == new_acc and emp.room == new_room), None)
             
     if original_record_index != -1 and target_record_index is not None:
         all_employees[target_record_index].update(employee_data)
-        all_employees[target_record_index].update({'Accommodation': new_acc, 'Room': new_room, 'Status': 'Active'})
+        all_employees[target_record_index].update({'Accommodation': new_acc, 'Room': new_room, 'Status': ACTIVE})
         
-        all_employees[original_record_index] = {
-            'Accommodation': employee_data.get('Accommodation'), 'Room': employee_data.get('Room'),
-            'SAP ID': '', 'Emp Name': '', 'Designation': '', 'Department': '', 'Status': 'Vacant', 'Nationality': ''
-        }
+        all_employees[original_record_index] = Employee.vacant(employee_data.get('Accommodation'), employee_data.get('Room'))
         save_data_to_json(all_employees)
         flash(f"Employee {sap_id} shifted successfully.")
         return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
 
     flash('Shift failed. Could not find target vacant room.')
     return redirect(url_for('staff_bp.staff_details', sap_id=sap_id))
+
+def batch_reply(body, status=200, message=None):
+    # JSON callers get the body; the accommodation page's batch forms get a flash message
+    if request.is_json:
+        return jsonify(body), status
+    flash(message or body.get('error'))
+    return redirect(url_for('acc_bp.accommodation_data'))
+
+def describe_rows(rows, limit=10):
+    text = '; '.join(f"{row['sap_id']}: {row['error']}" for row in rows[:limit])
+    return text + (f" and {len(rows) - limit} more" if len(rows) > limit else '')
+
+BULK_SHEET_COLUMNS = {'SAP ID': 'sap_id', 'New Accommodation': 'accommodation', 'New Room': 'room', 'Block': 'block'}
+
+def read_bulk_rows():
+    # Rows for the bulk endpoints, as dicts with sap_id and, for shifts, accommodation and
+    # optionally room or block. Accepts a JSON body ({"rows": [SAP ID or {...}, ...]}), an
+    # uploaded spreadsheet (file, with the BULK_SHEET_COLUMNS headers) or a sap_ids text field.
+    # A top-level accommodation, room or block applies to every row that leaves it out.
+    payload = request.get_json(silent=True)
+    if isinstance(payload, list):
+        defaults, entries = {}, payload
+    elif isinstance(payload, dict):
+        defaults = payload
+        entries = payload.get('rows') or payload.get('sap_ids') or []
+    elif request.files.get('file') and request.files['file'].filename:
+        import pandas as pd
+        defaults = request.form
+        df = pd.read_excel(request.files['file']).fillna('')
+        if 'SAP ID' not in df.columns:
+            raise ValueError("The spreadsheet needs a 'SAP ID' column.")
+        entries = [{key: record[column] for column, key in BULK_SHEET_COLUMNS.items() if record.get(column, '') != ''}
+                   for record in df.to_dict('records')]
+    elif payload is not None:
+        raise ValueError('the body must be a JSON object or list.')
+    else:
+        defaults = request.form
+        entries = [sap_id for sap_id in re.split(r'[\s,;]+', request.form.get('sap_ids', '')) if sap_id]
+    if not isinstance(entries, list):
+        raise ValueError('rows must be a list.')
+
+    rows = []
+    for entry in entries:
+        row = dict(entry) if isinstance(entry, dict) else {'sap_id': entry}
+        for key in ('accommodation', 'room', 'block'):
+            if row.get(key) in (None, '') and defaults.get(key) not in (None, ''):
+                row[key] = defaults.get(key)
+            if row.get(key) in (None, ''):
+                row.pop(key, None)
+            elif isinstance(row[key], (str, int, float)):
+                # spreadsheets read room numbers and blocks as numbers
+                row[key] = str(int(row[key])) if isinstance(row[key], float) and row[key].is_integer() else str(row[key])
+            else:
+                raise ValueError(f'{key} must be text.')
+        rows.append(row)
+    return rows
+
+def resolve_bulk_rows(rows):
+    # One pass over the batch: each row gets a result dict, and the rows that can be applied
+    # come back as (result, row, roster position)
+    positions = get_employee_positions()
+    allowed = allowed_scope()
+    results, valid, seen = [], [], set()
+    for row in rows:
+        sap_id = sap_key(row.get('sap_id'))
+        result = {'sap_id': row.get('sap_id') if sap_id is None else sap_id}
+        results.append(result)
+        position = positions.get(sap_id)
+        if sap_id is None:
+            result['error'] = 'Invalid SAP ID'
+        elif sap_id in seen:
+            result['error'] = 'Listed more than once'
+        elif position is None:
+            result['error'] = 'Employee not found'
+        elif all_employees[position].get('Accommodation') in NO_ACCOMMODATION:
+            result['error'] = 'Employee is already checked out'
+        elif allowed is not None and all_employees[position].get('Accommodation') not in allowed:
+            result['error'] = f"Access denied for {all_employees[position].get('Accommodation')}"
+        else:
+            valid.append((result, row, position))
+        seen.add(sap_id)
+    return results, valid
+
+def bulk_response(results, action):
+    done = sum(1 for result in results if 'error' not in result)
+    for result in results:
+        result['result'] = 'error' if 'error' in result else action
+    failed = [result for result in results if 'error' in result]
+    message = f"{action.replace('_', ' ').capitalize()} {done} of {len(results)} staff."
+    if failed:
+        message += f" Failed: {describe_rows(failed)}"
+    return batch_reply({action: done, 'failed': len(failed), 'rows': results}, message=message)
+
+@staff_bp.route('/bulk_checkout', methods=['POST'])
+@serialized(employees_guard)
+def bulk_checkout():
+    # Checks out every valid row and saves once; invalid rows are reported and left alone
+    global all_employees
+    if 'username' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        rows = read_bulk_rows()
+    except Exception as e:
+        return batch_reply({"error": f"Error reading rows: {e}"}, 400)
+    if not rows:
+        return batch_reply({"error": "No SAP IDs given"}, 400)
+
+    results, valid = resolve_bulk_rows(rows)
+    for result, row, position in valid:
+        emp = all_employees[position]
+        ex_employee_record = emp.copy()
+        ex_employee_record.update({'Status': 'Checked-Out', 'Accommodation': 'N/A', 'Room': 'N/A'})
+        all_employees[position] = Employee.vacant(emp.get('Accommodation'), emp.get('Room'))
+        all_employees.append(ex_employee_record)
+        result.update({'accommodation': emp.get('Accommodation'), 'room': emp.get('Room')})
+    if valid:
+        save_data_to_json(all_employees)
+    return bulk_response(results, 'checked_out')
+
+@staff_bp.route('/bulk_shift', methods=['POST'])
+@serialized(employees_guard)
+def bulk_shift():
+    # Moves every valid row into a free bed of its target accommodation (a given room, a
+    # block, or any bed) and saves once. Beds vacated by the batch are not reused within it.
+    global all_employees
+    if 'username' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        rows = read_bulk_rows()
+    except Exception as e:
+        return batch_reply({"error": f"Error reading rows: {e}"}, 400)
+    if not rows:
+        return batch_reply({"error": "No SAP IDs given"}, 400)
+
+    results, valid = resolve_bulk_rows(rows)
+    inventory = get_room_inventory()
+    allowed = allowed_scope()
+    moves = []
+    for result, row, position in valid:
+        new_acc, new_room, block = row.get('accommodation'), row.get('room'), row.get('block')
+        if not new_acc:
+            result['error'] = 'No target accommodation'
+            continue
+        if allowed is not None and new_acc not in allowed:
+            result['error'] = f"Access denied for {new_acc}"
+            continue
+        beds = inventory.get(new_acc)
+        if beds is None:
+            result['error'] = f"Unknown accommodation: {new_acc}"
+            continue
+        if new_room:
+            bed = beds.free_bed_in_room(new_room)
+        else:
+            free = beds.free_beds(1, block)
+            bed = free[0] if free else None
+        if bed is None:
+            result['error'] = f"No free bed in {new_acc}" + (f" room {new_room}" if new_room else f" block {block}" if block else '')
+            continue
+        beds.occupy(bed)
+        moves.append((result, position, beds.positions[bed]))
+
+    for result, original_record_index, target_record_index in moves:
+        employee_data = all_employees[original_record_index].copy()
+        target = all_employees[target_record_index]
+        result.update({'from': {'accommodation': employee_data.get('Accommodation'), 'room': employee_data.get('Room')},
+                       'to': {'accommodation': target.get('Accommodation'), 'room': target.get('Room')}})
+        target.update(employee_data)
+        target.update({'Accommodation': result['to']['accommodation'], 'Room': result['to']['room'], 'Status': ACTIVE})
+        all_employees[original_record_index] = Employee.vacant(employee_data.get('Accommodation'), employee_data.get('Room'))
+    if moves:
+        save_data_to_json(all_employees)
+    return bulk_response(results, 'shifted')
+
 @staff_bp.route('/add_staff', methods=['POST'])
+@serialized(employees_guard)
 def add_staff():
     global all_employees
     form_data = request.form
@@ -306,45 +594,142 @@ def add_staff():
 
     new_sap_id = form_data.get('sap_id')
 
-    for existing_emp in all_employees:
-        try:
-            if existing_emp.get('SAP ID') and int(float(existing_emp.get('SAP ID'))) == int(new_sap_id):
-                flash("Error: Staff already exist in the data.")
-                return redirect(url_for('acc_bp.accommodation_data'))
-        except (ValueError, TypeError): continue
+    if new_sap_id and sap_key(new_sap_id) in get_employee_index():
+        flash("Error: Staff already exist in the data.")
+        return redirect(url_for('acc_bp.accommodation_data'))
 
     room_num = form_data.get('room_number')
-    for emp in all_employees:
-        if emp.get('Accommodation') == acc_name and emp.get('Room') == room_num and emp.get('Status') == 'Vacant':
-            emp.update({
-                'SAP ID': int(new_sap_id), 'Emp Name': form_data.get('emp_name'),
-                'Designation': form_data.get('designation'), 'Department': form_data.get('department'),
-                'Nationality': form_data.get('nationality'), 'Status': 'Active'
-            })
-            save_data_to_json(all_employees)
-            flash(f"Successfully added {emp['Emp Name']}.")
-            return redirect(url_for('acc_bp.accommodation_data'))
+    beds = get_room_inventory().get(acc_name)
+    bed = beds.free_bed_in_room(room_num) if beds else None
+    if bed is not None:
+        emp = all_employees[beds.positions[bed]]
+        emp.update({
+            'SAP ID': int(new_sap_id), 'Emp Name': form_data.get('emp_name'),
+            'Designation': form_data.get('designation'), 'Department': form_data.get('department'),
+            'Nationality': form_data.get('nationality'), 'Status': ACTIVE
+        })
+        save_data_to_json(all_employees)
+        flash(f"Successfully added {emp['Emp Name']}.")
+        return redirect(url_for('acc_bp.accommodation_data'))
     
     flash("Error: Could not find the selected vacant room.")
     return redirect(url_for('acc_bp.accommodation_data'))
 
 @staff_bp.route('/get_vacant_rooms/<accommodation_name>')
+@etag_from_datasets(employees_guard)
 def get_vacant_rooms(accommodation_name):
     if 'username' not in session:
         return jsonify({"error": "Unauthorized"}), 401
     
-    vacant_rooms = [emp['Room'] for emp in all_employees if emp.get('Accommodation') == accommodation_name and emp.get('Status') == 'Vacant']
-    return jsonify(sorted(list(set(vacant_rooms))))
+    return jsonify(sorted(get_room_inventory().vacant_rooms(accommodation_name)))
+
+@staff_bp.route('/room_inventory/<accommodation_name>')
+@etag_from_datasets(employees_guard)
+def room_inventory(accommodation_name):
+    if 'username' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    allowed = allowed_scope()
+    if allowed is not None and accommodation_name not in allowed:
+        return jsonify({"error": "Access denied"}), 403
+
+    beds = get_room_inventory().get(accommodation_name)
+    if beds is None:
+        return jsonify({"error": f"Unknown accommodation: {accommodation_name}"}), 404
+    return jsonify(beds.summary())
+
+ALLOCATION_FIELDS = {'emp_name': 'Emp Name', 'designation': 'Designation', 'department': 'Department', 'nationality': 'Nationality'}
+ALLOCATION_SHEET_COLUMNS = {'SAP ID': 'sap_id', **{column: field for field, column in ALLOCATION_FIELDS.items()}}
+
+def read_allocation_sheet(file):
+    import pandas as pd
+    df = pd.read_excel(file).fillna('')
+    if 'SAP ID' not in df.columns:
+        raise ValueError("The spreadsheet needs a 'SAP ID' column.")
+    return [{field: record[column] for column, field in ALLOCATION_SHEET_COLUMNS.items() if column in record}
+            for record in df.to_dict('records')]
+
+@staff_bp.route('/allocate_beds', methods=['POST'])
+@serialized(employees_guard)
+def allocate_beds():
+    # Places a batch of incoming staff into free beds of one accommodation with a single save.
+    # JSON body: {"accommodation": ..., "block": optional, "employees": [SAP ID or
+    # {"sap_id", "emp_name", "designation", "department", "nationality"}, ...]}; the
+    # accommodation page posts accommodation, block and a spreadsheet (file, with the
+    # ALLOCATION_SHEET_COLUMNS headers) or a sap_ids text field instead. Nothing is written
+    # unless every row is valid and there are enough free beds.
+    global all_employees
+    if 'username' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    elif not isinstance(payload, dict):
+        return batch_reply({"error": "Request body must be a JSON object"}, 400)
+    accommodation = payload.get('accommodation') or request.form.get('accommodation')
+    block = payload.get('block') or request.form.get('block') or None
+    if block is not None and not isinstance(block, (str, int)):
+        return batch_reply({"error": "block must be a string"}, 400)
+    block = str(block) if block is not None else None
+    incoming = payload.get('employees')
+    if incoming is None and request.files.get('file') and request.files['file'].filename:
+        try:
+            incoming = read_allocation_sheet(request.files['file'])
+        except Exception as e:
+            return batch_reply({"error": f"Error reading the spreadsheet: {e}"}, 400)
+    elif incoming is None:
+        incoming = [sap_id for sap_id in re.split(r'[\s,;]+', request.form.get('sap_ids', '')) if sap_id]
+    if not isinstance(accommodation, str) or not accommodation or not isinstance(incoming, list) or not incoming:
+        return batch_reply({"error": "accommodation and a non-empty employees list are required"}, 400)
+
+    allowed = allowed_scope()
+    if allowed is not None and accommodation not in allowed:
+        return batch_reply({"error": f"Access denied for {accommodation}"}, 403)
+
+    index = get_employee_index()
+    rows, seen, errors = [], set(), []
+    for entry in incoming:
+        details = entry if isinstance(entry, dict) else {'sap_id': entry}
+        raw_id = details.get('sap_id')
+        sap_id = sap_key(raw_id)
+        if sap_id is None:
+            errors.append({"sap_id": raw_id, "error": "Invalid SAP ID"})
+        elif sap_id in seen:
+            errors.append({"sap_id": sap_id, "error": "Listed more than once"})
+        elif sap_id in index:
+            errors.append({"sap_id": sap_id, "error": "Staff already exist in the data"})
+        else:
+            seen.add(sap_id)
+            rows.append((sap_id, details))
+    if errors:
+        return batch_reply({"error": "Some rows are invalid; nothing was allocated", "rows": errors}, 400,
+                           f"Some rows are invalid; nothing was allocated. {describe_rows(errors)}")
+
+    beds = get_room_inventory().get(accommodation)
+    free = beds.free_beds(len(rows), block) if beds else []
+    if len(free) < len(rows):
+        return batch_reply({"error": f"Only {len(free)} free beds in {accommodation}{' block ' + block if block else ''}",
+                            "requested": len(rows), "free": len(free)}, 409)
+
+    allocated = []
+    for (sap_id, details), bed in zip(rows, free):
+        emp = all_employees[beds.positions[bed]]
+        emp.update({column: details.get(field, '') for field, column in ALLOCATION_FIELDS.items()})
+        emp.update({'SAP ID': sap_id, 'Status': ACTIVE})
+        beds.occupy(bed)
+        allocated.append({"sap_id": sap_id, "room": emp.room, "block": room_block(emp.room)})
+    save_data_to_json(all_employees)
+    return batch_reply({"accommodation": accommodation, "allocated": allocated, "free": beds.free_count()}, 200,
+                       f"Allocated {len(allocated)} staff to free beds in {accommodation}. {beds.free_count()} beds remain free.")
 
 @staff_bp.route('/get_country_details/<country_name>')
 def get_country_details(country_name):
     if 'username' not in session:
         return jsonify({"error": "Unauthorized"}), 401
     
-    for country in countries_data:
-        if country['name'] == country_name:
-            states = [state['name'] for state in country.get('states', [])]
-            phone_code = country.get('phone_code', '')
-            return jsonify({"states": sorted(states), "phone_code": phone_code})
-    
-    return jsonify({"states": [], "phone_code": ""})
+    states, phone_code, etag = get_countries_index().get(country_name, ([], '', 'unknown-country'))
+    response = jsonify({"states": states, "phone_code": phone_code})
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = COUNTRY_CACHE_SECONDS
+    return response.make_conditional(request)
@@ -1,12 +1,16 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash, Response
-from routes.staff_routes import all_employees
+from routes.staff_routes import get_employees, employees_guard
 from utils.permissions import can_modify, can_access_central_store
+from utils.exports import dataframe_to_xlsx
+from utils.metrics import timed, scanned
+from utils.datastore import DatasetGuard, serialized, atomic_write, UnitOfWork
+from utils.snapshots import load_json
+from utils.ledger import StoreLedger
+import datetime
 import json
 import os
 import time
 from collections import defaultdict
-import pandas as pd
-import io
 
 store_bp = Blueprint('store_bp', __name__)
 
@@ -14,13 +18,86 @@ ITEMS_FILE = 'store_items.json'
 INVENTORY_FILE = 'store_inventory.json'
 ISSUED_FILE = 'issued_items.json'
 
+@timed('load')
 def load_data(file_path):
     try:
-        with open(file_path, 'r') as f: return json.load(f)
+        return load_json(file_path)
     except (FileNotFoundError, json.JSONDecodeError): return []
 
 def save_data(data, file_path):
-    with open(file_path, 'w') as f: json.dump(data, f, indent=4)
+    atomic_write(file_path, data)
+
+items_guard = DatasetGuard(ITEMS_FILE)
+inventory_guard = DatasetGuard(INVENTORY_FILE)
+issued_guard = DatasetGuard(ISSUED_FILE)
+
+# Stock and issued quantities come from the movement ledger; store_inventory.json is
+# rewritten from it after every movement and issued_items.json keeps the issue records
+LEDGER_FILE = 'store_ledger.jsonl'
+CHECKPOINT_DIR = 'store_checkpoints'
+ledger = StoreLedger(LEDGER_FILE, CHECKPOINT_DIR)
+ledger_guard = DatasetGuard(LEDGER_FILE)
+
+def opening_events(issued_items):
+    # The first time the ledger is used it starts from the existing inventory and issue records
+    events = []
+    for item in load_data(INVENTORY_FILE):
+        if 'item_name' in item and 'accommodation' in item:
+            events.append({'type': 'adjust', 'accommodation': item['accommodation'], 'item_name': item['item_name'],
+                           'stock': item.get('quantity', 0), 'remarks': item.get('remarks', ''), 'reason': 'Opening balance'})
+    issued = defaultdict(int)
+    for item in issued_items:
+        if 'item_name' in item and 'accommodation' in item:
+            issued[(item['accommodation'], item['item_name'])] += item.get('quantity', 0)
+    events.extend({'type': 'adjust', 'accommodation': accommodation, 'item_name': item_name, 'issued': quantity, 'reason': 'Opening balance'}
+                  for (accommodation, item_name), quantity in issued.items())
+    return events
+
+def issue_id(item):
+    return item['id'] if isinstance(item.get('id'), int) else 0
+
+def record_missing_issues(issued_items):
+    # Caller holds ledger_guard. Issue records are saved before their ledger event is
+    # appended; records above the ledger's last issue id lost their event to a crash.
+    last_issue = ledger.last_issue_id()
+    missing = [dict(item, type='issue', reason='Recovered issue') for item in issued_items if issue_id(item) > last_issue]
+    if missing:
+        ledger.append(sorted(missing, key=issue_id))
+
+ledger_checked = False
+
+def ensure_ledger():
+    global ledger_checked
+    if not ledger.exists() or not ledger_checked:
+        with ledger_guard.locked():
+            issued_items = load_data(ISSUED_FILE)
+            if not ledger.exists():
+                ledger.create(opening_events(issued_items), last_issue=max(map(issue_id, issued_items), default=0))
+            else:
+                record_missing_issues(issued_items)
+            ledger_checked = True
+
+def store_balances(as_of=None):
+    # as_of: a date; balances after the last movement of that day
+    ensure_ledger()
+    if as_of:
+        return ledger.balances_at(datetime.datetime.combine(as_of, datetime.time.max).isoformat(timespec='microseconds'))
+    return ledger.current()
+
+def record_movement(event):
+    # Caller holds ledger_guard and inventory_guard
+    ensure_ledger()
+    ledger.append([dict(event, user=session.get('username'))])
+    return ledger.current().inventory_rows()
+
+def parse_as_of(value):
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        flash(f"Invalid date: {value}")
+        return None
 
 @store_bp.route('/store')
 def store_report():
@@ -28,22 +105,24 @@ def store_report():
 
     role = session.get('role')
     allowed = session.get('allowed_accommodations', [])
-    
-    inventory = load_data(INVENTORY_FILE)
+
+    # versions of the data rendered below, taken before reading it
+    items_version = items_guard.refresh()
+    locations_version = employees_guard.refresh()
+    summary_version = (ledger_guard.refresh(), locations_version)
     master_items = load_data(ITEMS_FILE)
-    issued_items = load_data(ISSUED_FILE)
     search_query = request.args.get('search', '').lower()
+    as_of = parse_as_of(request.args.get('as_of'))
+    balances = store_balances(as_of)
 
-    all_locations = ['Central Store'] + sorted(list(set(emp['Accommodation'] for emp in all_employees)))
+    all_locations = ['Central Store'] + sorted(list(set(emp['Accommodation'] for emp in scanned(get_employees(), 'employees'))))
     summary = defaultdict(lambda: {loc: {'stock': 0, 'issued': 0} for loc in all_locations})
 
-    for item in inventory:
-        if 'item_name' in item and 'accommodation' in item:
-            summary[item['item_name']][item['accommodation']]['stock'] = item.get('quantity', 0)
-    
-    for item in issued_items:
-        if 'item_name' in item and 'accommodation' in item:
-            summary[item['item_name']][item['accommodation']]['issued'] += item.get('quantity', 0)
+    for (accommodation, item_name), balance in scanned(balances.items(), 'store_ledger'):
+        locations = summary[item_name]
+        if accommodation in locations:
+            locations[accommodation]['stock'] = balance.stock
+            locations[accommodation]['issued'] = balance.issued
 
     if search_query:
         filtered_summary = {
@@ -65,9 +144,15 @@ def store_report():
                            all_locations=all_locations,
                            visible_locations=visible_locations,
                            accommodations=accommodations_for_forms,
-                           master_items=master_items)
+                           master_items=master_items,
+                           search_query=search_query,
+                           as_of=as_of.isoformat() if as_of else '',
+                           items_version=items_version,
+                           summary_version=summary_version,
+                           locations_version=locations_version)
 
 @store_bp.route('/add_store_item', methods=['POST'])
+@serialized(items_guard)
 def add_store_item():
     if session.get('role') not in ['Admin', 'Manager']:
         flash("Access Denied.")
@@ -84,7 +169,9 @@ def add_store_item():
     return redirect(url_for('store_bp.store_report'))
 
 @store_bp.route('/upload_master_items', methods=['POST'])
+@serialized(items_guard)
 def upload_master_items():
+    import pandas as pd
     if session.get('role') not in ['Admin', 'Manager']:
         flash("Access Denied.")
         return redirect(url_for('store_bp.store_report'))
@@ -126,6 +213,7 @@ def upload_master_items():
     return redirect(url_for('store_bp.store_report'))
 
 @store_bp.route('/receive_stock', methods=['POST'])
+@serialized(ledger_guard, inventory_guard)
 def receive_stock():
     form_data = request.form
     accommodation = form_data.get('accommodation')
@@ -136,24 +224,16 @@ def receive_stock():
     if not can_modify(accommodation):
         return redirect(url_for('store_bp.store_report'))
         
-    inventory = load_data(INVENTORY_FILE)
     item_name = form_data.get('item_name')
     quantity = int(form_data.get('quantity', 0))
-    
-    item_found = False
-    for item in inventory:
-        if item.get('accommodation') == accommodation and item.get('item_name') == item_name:
-            item['quantity'] = item.get('quantity', 0) + quantity
-            item_found = True
-            break
-    if not item_found:
-        inventory.append({'accommodation': accommodation, 'item_name': item_name, 'quantity': quantity, 'remarks': ''})
-        
+
+    inventory = record_movement({'type': 'receive', 'accommodation': accommodation, 'item_name': item_name, 'quantity': quantity})
     save_data(inventory, INVENTORY_FILE)
     flash(f"Received {quantity} of {item_name} at {accommodation}.")
     return redirect(url_for('store_bp.store_report'))
 
 @store_bp.route('/distribute_stock', methods=['POST'])
+@serialized(ledger_guard, inventory_guard)
 def distribute_stock():
     if not can_access_central_store():
         flash("Access Denied: Only Central Store users can distribute stock.")
@@ -164,28 +244,20 @@ def distribute_stock():
     item_name = form_data.get('item_name_dist')
     quantity = int(form_data.get('quantity_dist', 0))
     remarks = f"Received by {form_data.get('emp_name')} ({form_data.get('sap_id')}). Remarks: {form_data.get('remarks')}"
-    inventory = load_data(INVENTORY_FILE)
 
-    central_stock = next((item for item in inventory if item.get('accommodation') == 'Central Store' and item.get('item_name') == item_name), None)
-    
-    if not central_stock or central_stock.get('quantity', 0) < quantity:
+    central_stock = store_balances().get(('Central Store', item_name))
+    if not central_stock or not central_stock.stocked or central_stock.stock < quantity:
         flash(f"Not enough stock for {item_name} in Central Store.")
         return redirect(url_for('store_bp.store_report'))
-        
-    central_stock['quantity'] -= quantity
-    
-    target_stock = next((item for item in inventory if item.get('accommodation') == target_acc and item.get('item_name') == item_name), None)
-    if target_stock:
-        target_stock['quantity'] = target_stock.get('quantity', 0) + quantity
-        target_stock['remarks'] = remarks
-    else:
-        inventory.append({'accommodation': target_acc, 'item_name': item_name, 'quantity': quantity, 'remarks': remarks})
-        
+
+    inventory = record_movement({'type': 'distribute', 'source': 'Central Store', 'accommodation': target_acc,
+                                 'item_name': item_name, 'quantity': quantity, 'remarks': remarks})
     save_data(inventory, INVENTORY_FILE)
     flash(f"Distributed {quantity} of {item_name} to {target_acc}.")
     return redirect(url_for('store_bp.store_report'))
 
 @store_bp.route('/issue_to_employee', methods=['POST'])
+@serialized(ledger_guard, inventory_guard, issued_guard)
 def issue_to_employee():
     form_data = request.form
     accommodation = form_data.get('accommodation_issue')
@@ -194,58 +266,88 @@ def issue_to_employee():
         
     item_name = form_data.get('item_name_issue')
     quantity = int(form_data.get('quantity_issue', 0))
-    inventory = load_data(INVENTORY_FILE)
-    
-    stock = next((item for item in inventory if item.get('accommodation') == accommodation and item.get('item_name') == item_name), None)
-    if not stock or stock.get('quantity', 0) < quantity:
+
+    ensure_ledger()
+    issued_items = load_data(ISSUED_FILE)
+    record_missing_issues(issued_items)
+    stock = store_balances().get((accommodation, item_name))
+    if not stock or not stock.stocked or stock.stock < quantity:
         flash(f"Not enough stock for {item_name} at {accommodation}.")
         return redirect(url_for('store_bp.store_report'))
-        
-    stock['quantity'] -= quantity
-    save_data(inventory, INVENTORY_FILE)
-    
-    issued_items = load_data(ISSUED_FILE)
+
     new_issue = {
-        'id': int(time.time() * 1000), 'accommodation': accommodation,
+        'id': max(int(time.time() * 1000), ledger.last_issue_id() + 1), 'accommodation': accommodation,
         'item_name': item_name, 'quantity': quantity,
         'sap_id': form_data.get('sap_id'), 'emp_name': form_data.get('emp_name'),
         'designation': form_data.get('designation'), 'department': form_data.get('department'),
         'issue_date': form_data.get('issue_date'), 'remarks': form_data.get('remarks')
     }
     issued_items.append(new_issue)
-    save_data(issued_items, ISSUED_FILE)
+    event = dict(new_issue, type='issue')
+    balances = store_balances().copy()
+    balances.apply(event)
+
+    # The records go first; if the ledger append is lost, record_missing_issues replays it
+    uow = UnitOfWork()
+    uow.stage(INVENTORY_FILE, balances.inventory_rows(), inventory_guard)
+    uow.stage(ISSUED_FILE, issued_items, issued_guard)
+    uow.commit()
+    record_movement(event)
     
     flash(f"Issued {quantity} of {item_name} to {form_data.get('emp_name')}.")
     return redirect(url_for('store_bp.store_report'))
 
+@store_bp.route('/adjust_stock', methods=['POST'])
+@serialized(ledger_guard, inventory_guard)
+def adjust_stock():
+    # Stock count correction: records the difference between the counted and the booked quantity
+    if session.get('role') not in ['Admin', 'Manager']:
+        flash("Access Denied.")
+        return redirect(url_for('store_bp.store_report'))
+
+    form_data = request.form
+    accommodation = form_data.get('accommodation_adjust')
+    item_name = form_data.get('item_name_adjust')
+    counted = int(form_data.get('counted_quantity', 0))
+    reason = form_data.get('reason', '')
+    if counted < 0:
+        flash("Counted quantity cannot be negative.")
+        return redirect(url_for('store_bp.store_report'))
+
+    balance = store_balances().get((accommodation, item_name))
+    booked = balance.stock if balance and balance.stocked else 0
+    inventory = record_movement({'type': 'adjust', 'accommodation': accommodation, 'item_name': item_name,
+                                 'stock': counted - booked, 'reason': reason})
+    save_data(inventory, INVENTORY_FILE)
+    flash(f"Adjusted {item_name} at {accommodation} from {booked} to {counted}.")
+    return redirect(url_for('store_bp.store_report'))
+
 @store_bp.route('/issued_details/<accommodation>/<item_name>')
 def issued_details(accommodation, item_name):
     if 'username' not in session: return redirect(url_for('auth_bp.login'))
     if not can_modify(accommodation): return redirect(url_for('store_bp.store_report'))
     
     issued_items = load_data(ISSUED_FILE)
-    filtered_records = [item for item in issued_items if item.get('accommodation') == accommodation and item.get('item_name') == item_name]
+    filtered_records = [item for item in scanned(issued_items, 'issued_items', 'filter') if item.get('accommodation') == accommodation and item.get('item_name') == item_name]
     return render_template('issued_details.html', issued_records=filtered_records, accommodation=accommodation, item_name=item_name)
 
 @store_bp.route('/download_issued_details/<accommodation>/<item_name>', methods=['POST'])
 def download_issued_details(accommodation, item_name):
+    import pandas as pd
     if 'username' not in session: return redirect(url_for('auth_bp.login'))
     if not can_modify(accommodation): return redirect(url_for('store_bp.store_report'))
     
     issued_items = load_data(ISSUED_FILE)
-    records_to_download = [item for item in issued_items if item.get('accommodation') == accommodation and item.get('item_name') == item_name]
+    records_to_download = [item for item in scanned(issued_items, 'issued_items', 'filter') if item.get('accommodation') == accommodation and item.get('item_name') == item_name]
     
     df = pd.DataFrame(records_to_download)
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Issued_Details')
-    writer.close()
-    output.seek(0)
+    output = dataframe_to_xlsx(df, 'Issued_Details')
     
     return Response(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={"Content-Disposition": f"attachment;filename=issued_{item_name}_{accommodation}.xlsx"})
 
 @store_bp.route('/download_store_report', methods=['POST'])
 def download_store_report():
+    import pandas as pd
     if 'username' not in session: return redirect(url_for('auth_bp.login'))
 
     acc_filter = request.form.get('accommodation_report')
@@ -254,23 +356,27 @@ def download_store_report():
     if acc_filter and not can_modify(acc_filter):
         return redirect(url_for('store_bp.store_report'))
 
-    inventory = load_data(INVENTORY_FILE)
-    issued = load_data(ISSUED_FILE)
-    
-    if acc_filter:
-        inventory = [i for i in inventory if i.get('accommodation') == acc_filter]
-        issued = [i for i in issued if i.get('accommodation') == acc_filter]
+    as_of = parse_as_of(request.form.get('as_of'))
+    balances = {key: balance for key, balance in store_balances(as_of).items() if not acc_filter or key[0] == acc_filter}
 
     if report_type == 'Stock':
-        df = pd.DataFrame(inventory)
+        df = pd.DataFrame([{'accommodation': accommodation, 'item_name': item_name, 'quantity': balance.stock, 'remarks': balance.remarks}
+                           for (accommodation, item_name), balance in balances.items() if balance.stocked])
     elif report_type == 'Issued':
+        issued = load_data(ISSUED_FILE)
+        if acc_filter:
+            issued = [i for i in scanned(issued, 'issued_items', 'filter') if i.get('accommodation') == acc_filter]
         df = pd.DataFrame(issued)
     elif report_type == 'Balance':
         summary = defaultdict(lambda: {'stock': 0, 'issued': 0})
-        for item in inventory: summary[item['item_name']]['stock'] += item.get('quantity', 0)
-        for item in issued: summary[item['item_name']]['issued'] += item.get('quantity', 0)
+        for (accommodation, item_name), balance in balances.items():
+            if balance.stocked: summary[item_name]['stock'] += balance.stock
+            summary[item_name]['issued'] += balance.issued
         balance_data = [{'item_name': name, 'balance': data['stock'] - data['issued']} for name, data in summary.items()]
         df = pd.DataFrame(balance_data)
+    elif report_type == 'Movements':
+        ensure_ledger()
+        df = pd.DataFrame(ledger.events(acc_filter or None))
     else:
         flash("Invalid report type selected.")
         return redirect(url_for('store_bp.store_report'))
@@ -279,10 +385,6 @@ def download_store_report():
         flash("No data found for the selected report.")
         return redirect(url_for('store_bp.store_report'))
 
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name=report_type)
-    writer.close()
-    output.seek(0)
+    output = dataframe_to_xlsx(df, report_type)
     
     return Response(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={"Content-Disposition": f"attachment;filename={acc_filter or 'Total'}_{report_type}_Report.xlsx"})
\ No newline at end of file
@@ -0,0 +1,114 @@
+from flask import current_app, send_from_directory, make_response
+from werkzeug.utils import secure_filename
+from threading import Lock
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+# The refcount index and partial uploads live next to the served folder, never inside it
+INDEX_SUFFIX = '.index.json'
+PARTIAL_SUFFIX = '.partial'
+LEGACY_INDEX_FILE = 'attachments_index.json'
+CHUNK_SIZE = 64 * 1024
+ATTACHMENT_MAX_AGE = 365 * 24 * 3600
+
+_content_name = re.compile(r'^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$')
+# uploads made before content addressing were stored as <unix time>_<secure filename>
+_legacy_name = re.compile(r'^[0-9]+_[A-Za-z0-9._-]+$')
+_lock = Lock()
+
+def _index_path(folder):
+    return os.path.normpath(folder) + INDEX_SUFFIX
+
+def load_index(folder):
+    index_path = _index_path(folder)
+    legacy_path = os.path.join(folder, LEGACY_INDEX_FILE)
+    if not os.path.exists(index_path) and os.path.exists(legacy_path):
+        os.replace(legacy_path, index_path)
+    try:
+        with open(index_path, 'r') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return {}
+
+def save_index(index, folder):
+    index_path = _index_path(folder)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=4)
+    os.replace(tmp_path, index_path)
+
+def is_content_addressed(filename):
+    return bool(filename and _content_name.match(filename))
+
+def is_servable(filename):
+    return is_content_addressed(filename) or bool(filename and _legacy_name.match(filename))
+
+def save_attachment(file, folder):
+    # Streams the upload to disk while hashing it; identical content is stored once
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+    sha256 = hashlib.sha256()
+    partial_dir = os.path.normpath(folder) + PARTIAL_SUFFIX
+    os.makedirs(partial_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=partial_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                out.write(chunk)
+        stored_name = sha256.hexdigest() + ext
+        stored_path = os.path.join(folder, stored_name)
+
+        with _lock:
+            index = load_index(folder)
+            if os.path.exists(stored_path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, stored_path)
+            index[stored_name] = index.get(stored_name, 0) + 1
+            save_index(index, folder)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return stored_name
+
+def release_attachment(filename, folder):
+    if not filename:
+        return
+    with _lock:
+        index = load_index(folder)
+        if filename in index:
+            index[filename] -= 1
+            if index[filename] > 0:
+                save_index(index, folder)
+                return
+            del index[filename]
+            save_index(index, folder)
+        os.remove(os.path.join(folder, filename))
+
+def send_attachment(folder, filename):
+    # Range, If-Range and If-None-Match are handled by send_file; USE_X_SENDFILE is
+    # honoured by Flask itself, X_ACCEL_REDIRECT_PREFIX hands the file to nginx
+    filename = secure_filename(filename)
+    if not is_servable(filename):
+        return make_response('', 404)
+    accel_prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        if not os.path.isfile(os.path.join(folder, filename)):
+            return make_response('', 404)
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{os.path.basename(folder)}/{filename}"
+        return response
+
+    if not is_content_addressed(filename):
+        return send_from_directory(folder, filename)
+
+    # content-addressed files never change: the hash is a strong ETag and they can be cached for long
+    response = send_from_directory(folder, filename, etag=filename.split('.')[0], max_age=ATTACHMENT_MAX_AGE)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
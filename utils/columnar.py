@@ -0,0 +1,70 @@
+from utils.roster import FIELDS, CATEGORICAL, column_values, roster_columns
+import importlib.util
+import os
+
+# COLUMNAR_ROSTER=1 keeps a pandas copy of the roster next to the record list, with one
+# categorical column per low-cardinality field. Views filter and count with boolean masks
+# over it and exports slice it directly; the record list stays the source of truth and
+# the columns are rebuilt on first read after a reload or save.
+COLUMNAR_ROSTER = os.environ.get('COLUMNAR_ROSTER') == '1' and importlib.util.find_spec('pandas') is not None
+
+_CATEGORICAL_KEYS = {key for key, slot in FIELDS.items() if slot in CATEGORICAL}
+
+class ColumnarRoster:
+    def __init__(self, records):
+        import pandas as pd
+        self.records = records
+        data = {}
+        for key in roster_columns(records):
+            values = column_values(records, key)
+            data[key] = pd.Categorical(values) if key in _CATEGORICAL_KEYS else pd.Series(values, dtype=object)
+        self.frame = pd.DataFrame(data)
+        self._text = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def column(self, key):
+        return self.frame[key]
+
+    def everything(self):
+        import numpy as np
+        return np.ones(len(self.frame), dtype=bool)
+
+    def equals(self, key, value):
+        return (self.frame[key] == value).to_numpy(dtype=bool, na_value=False)
+
+    def isin(self, key, values):
+        return self.frame[key].isin(list(values)).to_numpy(dtype=bool)
+
+    def contains(self, key, needle):
+        # Case-insensitive substring match on str(value), like `needle in str(emp.get(key, '')).lower()`
+        text = self._text.get(key)
+        if text is None:
+            import pandas as pd
+            text = self._text[key] = pd.Series([str(value).lower() for value in column_values(self.records, key, default='')], dtype=object)
+        return text.str.contains(needle, regex=False).to_numpy(dtype=bool)
+
+    def scope(self, allowed, key='Accommodation'):
+        # allowed as returned by allowed_scope(): None for every accommodation
+        return self.everything() if allowed is None else self.isin(key, allowed)
+
+    def count(self, mask):
+        return int(mask.sum())
+
+    def counts(self, key, mask):
+        # value -> rows, in order of first appearance like Counter over the records
+        values = self.frame[key][mask].dropna()
+        totals = values.value_counts(sort=False)
+        return {value: int(totals[value]) for value in values.drop_duplicates()}
+
+    def distinct(self, key, mask):
+        return set(self.frame[key][mask].dropna())
+
+    def rows(self, mask):
+        import numpy as np
+        records = self.records
+        return [records[position] for position in np.flatnonzero(mask)]
+
+    def to_frame(self, mask):
+        return self.frame[mask].reset_index(drop=True)
@@ -0,0 +1,292 @@
+from flask import flash
+from utils.fragment_cache import dataset_version
+from utils.metrics import timed
+from contextlib import contextmanager, ExitStack
+from functools import wraps
+from threading import RLock, Event, Timer, local
+import glob
+import hashlib
+import json
+import os
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+JOURNAL_DIR = os.path.join(os.environ.get('RENDER_DATA_DIR', '.'), 'journal')
+GROUP_COMMIT_WINDOW = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 10)) / 1000
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+# A journal still being written is left alone; only temp journals this old are crash leftovers
+JOURNAL_TMP_MAX_AGE = 3600
+STALE_RECORD_MESSAGE = "This record was changed by someone else. Please reload the page and try again."
+
+class _Batch:
+    def __init__(self):
+        self.done = Event()
+        self.error = None
+        self.size = 0
+
+class DatasetGuard:
+    # Serializes writers of one JSON dataset: an in-process lock for threads plus an
+    # flock on <file>.lock for other workers. On entry the in-memory copy is reloaded
+    # if another worker saved the file since this worker last loaded or saved it.
+    #
+    # With group_commit, saves made within GROUP_COMMIT_WINDOW_MS (or until
+    # GROUP_COMMIT_MAX_BATCH saves) are written once. The flock stays held until the
+    # batch is on disk, and each request only returns after its batch is durable.
+    def __init__(self, file_path, reload=None, group_commit=False):
+        self.file_path = file_path
+        self.reload = reload
+        self.group_commit = group_commit and GROUP_COMMIT_WINDOW > 0
+        self._lock = RLock()
+        self._local = local()
+        self._version = None
+        self._frozen = False
+        self._lock_file = None
+        self._batch = None
+        self._pending_write = None
+
+    def mark_synced(self):
+        self._version = dataset_version(self.file_path)
+
+    def ensure_loaded(self):
+        # Datasets are parsed on first use instead of at import; writers load through sync()
+        if self._version is None and self.reload is not None:
+            with self._lock:
+                if self._version is None:
+                    self.reload()
+                    self.mark_synced()
+
+    def refresh(self):
+        # Read paths: reload if another worker saved since this one loaded or saved, and
+        # return the version the in-memory copy now reflects
+        if self.reload is None:
+            return dataset_version(self.file_path)
+        self.ensure_loaded()
+        if dataset_version(self.file_path) != self._version:
+            with self._lock:
+                if dataset_version(self.file_path) != self._version:
+                    self.sync()
+        return self._version
+
+    def preload(self):
+        # Loads the dataset read-only (reload(frozen=True)); the first writer swaps in a mutable copy
+        with self._lock:
+            self.reload(frozen=True)
+            self.mark_synced()
+            self._frozen = True
+
+    def sync(self):
+        if self.reload is not None and (self._frozen or dataset_version(self.file_path) != self._version):
+            self.reload()
+            self.mark_synced()
+            self._frozen = False
+
+    def _acquire_file_lock(self):
+        if self._lock_file is not None:
+            return
+        self._lock_file = open(self.file_path + '.lock', 'a')
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self.sync()
+
+    def _release_file_lock(self):
+        if self._lock_file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+        self._lock_file = None
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            depth = getattr(self._local, 'depth', 0)
+            self._local.depth = depth + 1
+            try:
+                if depth == 0:
+                    self._acquire_file_lock()
+                yield
+            finally:
+                self._local.depth = depth
+                if depth == 0 and self._batch is None:
+                    self._release_file_lock()
+
+        if depth == 0:
+            batch = self._local.__dict__.pop('batch', None)
+            if batch is not None:
+                batch.done.wait()
+                if batch.error is not None:
+                    raise batch.error
+
+    def commit(self, write):
+        # write() persists the whole in-memory dataset, so the latest one covers the batch
+        if not self.group_commit or getattr(self._local, 'depth', 0) == 0:
+            write()
+            self.mark_synced()
+            return
+
+        self._pending_write = write
+        if self._batch is None:
+            self._batch = _Batch()
+            Timer(GROUP_COMMIT_WINDOW, self.flush).start()
+        self._batch.size += 1
+        self._local.batch = self._batch
+        if self._batch.size >= GROUP_COMMIT_MAX_BATCH:
+            self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        batch, write = self._batch, self._pending_write
+        if batch is None:
+            return
+        self._batch = None
+        self._pending_write = None
+        try:
+            write()
+            self.mark_synced()
+        except Exception as e:
+            batch.error = e
+        finally:
+            if getattr(self._local, 'depth', 0) == 0:
+                self._release_file_lock()
+            batch.done.set()
+
+def serialized(*guards):
+    # Route decorator; several datasets are always locked in file order to avoid deadlocks
+    ordered = sorted(guards, key=lambda g: g.file_path)
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            with ExitStack() as stack:
+                for guard in ordered:
+                    stack.enter_context(guard.locked())
+                return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def record_version(record):
+    payload = json.dumps(record if isinstance(record, dict) else dict(record), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+def is_stale(record, submitted_version):
+    # Forms carry the version they were rendered from; a mismatch means someone else saved first
+    if not submitted_version:
+        return False
+    if record_version(record) != submitted_version:
+        flash(STALE_RECORD_MESSAGE)
+        return True
+    return False
+
+def _fsync_dir(path):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+@timed('save')
+def atomic_write(file_path, data):
+    # temp file + fsync + rename: readers and crashes only ever see the old or the new file
+    tmp_path = f'{file_path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+    _fsync_dir(file_path)
+
+class UnitOfWork:
+    # Stages new contents for several datasets and commits them together. The commit
+    # point is one fsynced journal rename; the datasets are then rewritten from it and
+    # recover_transactions() replays any journal left behind by a crash.
+    def __init__(self):
+        self.staged = {}
+        self.guards = []
+
+    def stage(self, file_path, data, guard=None):
+        self.staged[file_path] = data
+        if guard is not None and guard not in self.guards:
+            self.guards.append(guard)
+
+    def commit(self):
+        if not self.staged:
+            return
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        journal_path = os.path.join(JOURNAL_DIR, f'{uuid.uuid4().hex}.journal')
+        tmp_path = journal_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.staged, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, journal_path)
+        _fsync_dir(journal_path)
+
+        _apply_journal(journal_path)
+        for guard in self.guards:
+            guard.mark_synced()
+        self.staged = {}
+
+def _apply_journal(journal_path):
+    with open(journal_path, 'r') as f:
+        staged = json.load(f)
+    for file_path, data in staged.items():
+        atomic_write(file_path, data)
+    os.remove(journal_path)
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+@contextmanager
+def _dataset_flocks(file_paths):
+    # The same <file>.lock flocks DatasetGuard takes, in file order
+    with ExitStack() as stack:
+        for file_path in sorted(file_paths):
+            lock_file = stack.enter_context(open(file_path + '.lock', 'a'))
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+def _recover_journal(journal_path):
+    try:
+        with open(journal_path, 'r') as f:
+            staged = json.load(f)
+    except FileNotFoundError:
+        return
+    except json.JSONDecodeError:
+        os.remove(journal_path)
+        return
+    # A live writer holds these flocks from the journal rename until it removes the journal
+    with _dataset_flocks(staged):
+        journal_mtime = _mtime_ns(journal_path)
+        if journal_mtime is None:
+            return
+        for file_path, data in staged.items():
+            # a dataset saved after the journal was written is already applied or newer
+            file_mtime = _mtime_ns(file_path)
+            if file_mtime is None or file_mtime <= journal_mtime:
+                atomic_write(file_path, data)
+        os.remove(journal_path)
+
+def recover_transactions():
+    # Called at startup in every worker, possibly while other workers are committing
+    now = time.time()
+    for tmp_path in glob.glob(os.path.join(JOURNAL_DIR, '*.journal.tmp')):
+        mtime = _mtime_ns(tmp_path)
+        if mtime is not None and now - mtime / 1e9 > JOURNAL_TMP_MAX_AGE:
+            try: os.remove(tmp_path)
+            except FileNotFoundError: pass
+    journals = [(_mtime_ns(path), path) for path in glob.glob(os.path.join(JOURNAL_DIR, '*.journal'))]
+    for _, journal_path in sorted(journal for journal in journals if journal[0] is not None):
+        _recover_journal(journal_path)
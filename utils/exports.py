@@ -0,0 +1,13 @@
+from utils.metrics import timed
+import io
+
+@timed('export', dataset='xlsx')
+def dataframe_to_xlsx(df, sheet_name):
+    # pandas and xlsxwriter load on the first export, not at worker boot
+    import pandas as pd
+    output = io.BytesIO()
+    writer = pd.ExcelWriter(output, engine='xlsxwriter')
+    df.to_excel(writer, index=False, sheet_name=sheet_name)
+    writer.close()
+    output.seek(0)
+    return output
@@ -0,0 +1,48 @@
+from flask import session
+from markupsafe import Markup
+from collections import OrderedDict
+from threading import Lock
+import os
+
+FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 256))
+
+_fragments = OrderedDict()
+_lock = Lock()
+
+def dataset_version(*file_paths):
+    # mtime + size of the backing files, so every worker sees a save made by any other worker
+    version = []
+    for file_path in file_paths:
+        try:
+            st = os.stat(file_path)
+            version.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+def permission_scope():
+    role = session.get('role')
+    if role in ['Admin', 'Manager']:
+        return role
+    return (role, tuple(sorted(session.get('allowed_accommodations', []))))
+
+def cache_fragment(name, version=None, scoped=True, caller=None):
+    # Used from templates as {% call cache_fragment('name', version) %}...{% endcall %}
+    key = (name, permission_scope() if scoped else None, version)
+    with _lock:
+        html = _fragments.get(key)
+        if html is not None:
+            _fragments.move_to_end(key)
+            return html
+
+    html = Markup(caller())
+    with _lock:
+        _fragments[key] = html
+        _fragments.move_to_end(key)
+        while len(_fragments) > FRAGMENT_CACHE_SIZE:
+            _fragments.popitem(last=False)
+    return html
+
+def clear_fragments():
+    with _lock:
+        _fragments.clear()
@@ -0,0 +1,104 @@
+from flask import request, make_response, current_app
+from functools import wraps
+from utils.fragment_cache import permission_scope
+import gzip
+import hashlib
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ['text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript', 'text/javascript']
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+_static_hashes = {}
+
+def etag_from_datasets(*guards):
+    # Answers If-None-Match with a 304 before the view runs. The validator is the version each
+    # guard's in-memory copy was loaded at, after catching up with saves from other workers,
+    # so it always describes the data the view is about to render
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = repr((tuple(guard.refresh() for guard in guards), request.full_path, permission_scope()))
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
+def static_fingerprint(static_folder, filename):
+    file_path = os.path.join(static_folder, filename)
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    cached = _static_hashes.get(file_path)
+    if cached and cached[0] == st.st_mtime_ns:
+        return cached[1]
+    with open(file_path, 'rb') as f:
+        digest = hashlib.md5(f.read()).hexdigest()[:12]
+    _static_hashes[file_path] = (st.st_mtime_ns, digest)
+    return digest
+
+def compress_response(response):
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    if response.direct_passthrough:
+        # send_file responses (static css/js); only worth buffering when small
+        if response.content_length is None or response.content_length > 1024 * 1024:
+            return response
+        response.direct_passthrough = False
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(data))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+
+    # the encoded body is a different representation, so the validator becomes weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_http_cache(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+
+    @app.url_defaults
+    def add_static_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            fingerprint = static_fingerprint(app.static_folder, values['filename'])
+            if fingerprint:
+                values['v'] = fingerprint
+
+    @app.after_request
+    def apply_http_cache(response):
+        if request.endpoint == 'static' and request.args.get('v'):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return compress_response(response)
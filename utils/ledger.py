@@ -0,0 +1,304 @@
+from utils.datastore import atomic_write
+from utils.metrics import measure, name_dataset
+from utils.snapshots import load_json, snapshot_path
+from threading import RLock
+import datetime
+import json
+import os
+import uuid
+
+# Store movements are appended to a JSON-lines ledger, one event per line:
+#   receive     stock += quantity at accommodation
+#   distribute  stock moves from source (Central Store) to accommodation
+#   issue       stock -= quantity and issued += quantity at accommodation
+#   adjust      signed stock / issued corrections; opening balances are adjust events
+# Every STORE_CHECKPOINT_EVENTS events the balances are written to the checkpoint
+# directory together with the ledger offset they cover, so current and point-in-time
+# balances replay only the events after the nearest checkpoint. Pruning keeps the newest
+# STORE_CHECKPOINT_KEEP checkpoints plus the last one of every earlier day, so an as-of
+# query never replays more than a day's events.
+CHECKPOINT_EVERY = int(os.environ.get('STORE_CHECKPOINT_EVENTS', 500))
+CHECKPOINT_KEEP = max(1, int(os.environ.get('STORE_CHECKPOINT_KEEP', 5)))
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec='microseconds')
+
+def _stamp(at):
+    # ISO timestamp as it appears in checkpoint file names; sorts the same way
+    return at.replace('-', '').replace(':', '').replace('.', '')
+
+class Balance:
+    __slots__ = ('stock', 'issued', 'remarks', 'stocked')
+
+    def __init__(self, stock=0, issued=0, remarks='', stocked=False):
+        self.stock = stock
+        self.issued = issued
+        self.remarks = remarks
+        # only locations that ever held stock get a row in the inventory projection
+        self.stocked = stocked
+
+class Balances(dict):
+    # (accommodation, item_name) -> Balance, in order of first appearance
+    def at(self, accommodation, item_name):
+        key = (accommodation, item_name)
+        balance = self.get(key)
+        if balance is None:
+            balance = self[key] = Balance()
+        return balance
+
+    def apply(self, event):
+        kind, item_name, quantity = event['type'], event.get('item_name'), event.get('quantity', 0)
+        if kind == 'receive':
+            balance = self.at(event['accommodation'], item_name)
+            balance.stock += quantity
+            balance.stocked = True
+        elif kind == 'distribute':
+            self.at(event['source'], item_name).stock -= quantity
+            balance = self.at(event['accommodation'], item_name)
+            balance.stock += quantity
+            balance.stocked = True
+            balance.remarks = event.get('remarks', '')
+        elif kind == 'issue':
+            balance = self.at(event['accommodation'], item_name)
+            balance.stock -= quantity
+            balance.issued += quantity
+        elif kind == 'adjust':
+            balance = self.at(event['accommodation'], item_name)
+            balance.stock += event.get('stock', 0)
+            balance.issued += event.get('issued', 0)
+            balance.stocked = balance.stocked or 'stock' in event
+            if 'remarks' in event:
+                balance.remarks = event['remarks']
+
+    def copy(self):
+        return Balances((key, Balance(b.stock, b.issued, b.remarks, b.stocked)) for key, b in self.items())
+
+    def inventory_rows(self):
+        # The store_inventory.json shape
+        return [{'accommodation': accommodation, 'item_name': item_name, 'quantity': balance.stock, 'remarks': balance.remarks}
+                for (accommodation, item_name), balance in self.items() if balance.stocked]
+
+    def to_list(self):
+        return [[accommodation, item_name, b.stock, b.issued, b.remarks, b.stocked] for (accommodation, item_name), b in self.items()]
+
+    @classmethod
+    def from_list(cls, rows):
+        return cls(((accommodation, item_name), Balance(stock, issued, remarks, stocked)) for accommodation, item_name, stock, issued, remarks, stocked in rows)
+
+class StoreLedger:
+    # Writers hold the ledger's DatasetGuard. Each worker keeps the balances as of the byte
+    # offset it has read up to and only reads the lines appended since. New events are
+    # applied to a copy that then replaces self.balances, so a reader never sees it change.
+    def __init__(self, file_path, checkpoint_dir):
+        self.file_path = file_path
+        self.checkpoint_dir = checkpoint_dir
+        # every checkpoint file is saved under one label
+        name_dataset(checkpoint_dir, 'store_checkpoints')
+        self._lock = RLock()
+        self._reset()
+
+    def _reset(self):
+        self.ledger_id = None
+        self.balances = Balances()
+        self.seq = 0
+        self.offset = 0
+        self.inode = None
+        self.checkpoint_seq = 0
+        # highest issue id in the ledger; issue records above it have no event yet
+        self.last_issue = 0
+
+    def exists(self):
+        return os.path.exists(self.file_path)
+
+    def create(self, opening, last_issue=0):
+        # opening: adjust events carrying the balances this ledger starts from, which
+        # already count the issue records up to last_issue
+        ledger_id = uuid.uuid4().hex
+        with self._lock:
+            self._reset()
+        self.append([{'type': 'open', 'ledger': ledger_id, 'last_issue': last_issue}] + list(opening), create=True)
+        if self.checkpoint_seq != self.seq:
+            self.write_checkpoint()
+
+    def current(self):
+        # Balances as of the last complete line in the ledger; treat as read-only
+        with self._lock:
+            self._catch_up()
+            return self.balances
+
+    def last_issue_id(self):
+        with self._lock:
+            self._catch_up()
+            return self.last_issue
+
+    def _catch_up(self):
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            self._reset()
+            self.inode = st.st_ino
+            self.ledger_id = self._read_ledger_id()
+            self._load_checkpoint(self.latest_checkpoint())
+        if st.st_size > self.offset:
+            self.balances = self.balances.copy()
+            with measure('scan', 'store_ledger', st.st_size - self.offset):
+                for event in self._read_events(self.offset):
+                    self._apply(event)
+
+    def _read_ledger_id(self):
+        with open(self.file_path, 'rb') as f:
+            line = f.readline()
+        try:
+            return json.loads(line).get('ledger') if line.endswith(b'\n') else None
+        except ValueError:
+            return None
+
+    def _read_events(self, offset, until=None):
+        # Yields complete events from offset on; a line still being appended is left for next time
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                event = json.loads(line)
+                event['_end'] = offset = offset + len(line)
+                if until is not None and not until(event):
+                    break
+                yield event
+
+    def _apply(self, event):
+        if event['type'] == 'open':
+            self.ledger_id = event['ledger']
+            self.last_issue = event.get('last_issue', 0)
+        else:
+            self.balances.apply(event)
+            if event['type'] == 'issue' and isinstance(event.get('id'), int):
+                self.last_issue = max(self.last_issue, event['id'])
+        self.seq = event['seq']
+        self.offset = event['_end']
+
+    def append(self, events, create=False):
+        # Caller holds the ledger guard. Returns the events as written, with seq and time.
+        with self._lock:
+            if not create:
+                self._catch_up()
+            written = []
+            lines = []
+            for seq, event in enumerate(events, self.seq + 1):
+                event = {'seq': seq, 'at': _now(), **event}
+                written.append(event)
+                lines.append((json.dumps(event, default=str) + '\n').encode('utf-8'))
+            with open(self.file_path, 'ab') as f:
+                offset = f.tell()
+                if offset > self.offset and not create:
+                    # a torn line left by a writer that died mid-append; writers hold the guard
+                    f.truncate(self.offset)
+                    offset = self.offset
+                f.write(b''.join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+                self.inode = os.fstat(f.fileno()).st_ino
+            self.balances = self.balances.copy()
+            for event, line in zip(written, lines):
+                offset += len(line)
+                event['_end'] = offset
+                self._apply(event)
+                del event['_end']
+            if self.seq - self.checkpoint_seq >= CHECKPOINT_EVERY:
+                self.write_checkpoint()
+            return written
+
+    def checkpoint_path(self, seq, at):
+        return os.path.join(self.checkpoint_dir, f'{seq:012d}_{_stamp(at)}.json')
+
+    def write_checkpoint(self):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        at = _now()
+        atomic_write(self.checkpoint_path(self.seq, at), {
+            'ledger': self.ledger_id, 'seq': self.seq, 'offset': self.offset, 'at': at,
+            'last_issue': self.last_issue, 'balances': self.balances.to_list()})
+        self.checkpoint_seq = self.seq
+        self.prune_checkpoints()
+
+    def prune_checkpoints(self):
+        # Ordered by time, so checkpoints of a recreated ledger are not kept over the current ones
+        by_time = sorted(self.checkpoints(), key=lambda checkpoint: checkpoint[1])
+        last_of_day = {stamp[:8]: path for seq, stamp, path in by_time}
+        for seq, stamp, path in by_time[:-CHECKPOINT_KEEP]:
+            if last_of_day[stamp[:8]] == path:
+                continue
+            for stale in (path, snapshot_path(path)):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+    def checkpoints(self):
+        # [(seq, stamp, path)] oldest first
+        try:
+            names = os.listdir(self.checkpoint_dir)
+        except FileNotFoundError:
+            return []
+        found = []
+        for name in names:
+            seq, _, stamp = name[:-len('.json')].partition('_')
+            if name.endswith('.json') and seq.isdigit():
+                found.append((int(seq), stamp, os.path.join(self.checkpoint_dir, name)))
+        return sorted(found)
+
+    def latest_checkpoint(self, before=None):
+        # The newest checkpoint of this ledger accepted by before(seq, stamp)
+        for seq, stamp, path in reversed(self.checkpoints()):
+            if before is not None and not before(seq, stamp):
+                continue
+            try:
+                checkpoint = load_json(path)
+            except (OSError, ValueError):
+                continue
+            if checkpoint.get('ledger') == self.ledger_id:
+                return checkpoint
+        return None
+
+    def _load_checkpoint(self, checkpoint):
+        if checkpoint is None:
+            return
+        self.ledger_id = checkpoint['ledger']
+        self.balances = Balances.from_list(checkpoint['balances'])
+        self.seq = checkpoint['seq']
+        self.offset = checkpoint['offset']
+        self.checkpoint_seq = checkpoint['seq']
+        self.last_issue = checkpoint.get('last_issue', 0)
+
+    def balances_at(self, at):
+        # Balances after the last event at or before the ISO timestamp `at`
+        with self._lock:
+            self._catch_up()
+            ledger_id = self.ledger_id
+        if ledger_id is None:
+            return Balances()
+        stamp = _stamp(at)
+        checkpoint = self.latest_checkpoint(lambda seq, checkpoint_stamp: checkpoint_stamp <= stamp) if ledger_id else None
+        balances = Balances.from_list(checkpoint['balances']) if checkpoint else Balances()
+        offset = checkpoint['offset'] if checkpoint else 0
+        if not os.path.exists(self.file_path):
+            return balances
+        for event in self._read_events(offset, until=lambda event: event['at'] <= at):
+            if event['type'] != 'open':
+                balances.apply(event)
+        return balances
+
+    def events(self, accommodation=None):
+        # Full movement history, oldest first
+        if not os.path.exists(self.file_path):
+            return []
+        history = []
+        for event in self._read_events(0):
+            if event['type'] == 'open':
+                continue
+            if accommodation is None or accommodation in (event.get('accommodation'), event.get('source')):
+                del event['_end']
+                history.append(event)
+        return history
@@ -0,0 +1,248 @@
+from flask import request, g, has_request_context, session, Response, before_render_template, template_rendered
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+import hmac
+import json
+import os
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# /metrics is for Admins; a scraper gets in with METRICS_TOKEN as a bearer token or from an
+# address in METRICS_ALLOWED_IPS. Neither is set by default: behind a local reverse proxy
+# every request arrives from loopback.
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+PHASES = ('load', 'scan', 'filter', 'save', 'render', 'export')
+SLOW_OPERATION_MS = float(os.environ.get('SLOW_OPERATION_MS', 100))
+SLOW_LOG_FILE = os.path.join(os.environ.get('RENDER_DATA_DIR', '.'), 'slow_operations.log')
+SLOW_LOG_MAX_BYTES = int(os.environ.get('SLOW_LOG_MAX_BYTES', 5 * 1024 * 1024))
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self._lock = Lock()
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.help_text}')
+        lines.append(f'# TYPE {self.name} histogram')
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self.series.items()]
+        for label_values, counts, total, count in sorted(items):
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = ',' if labels else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+request_latency = Histogram('beeah_request_duration_seconds', 'Request latency by endpoint.', ('endpoint', 'method'), LATENCY_BUCKETS)
+phase_latency = Histogram('beeah_request_phase_seconds', 'Time spent per request in data load, scan, filter, save, render and export.', ('endpoint', 'phase'), LATENCY_BUCKETS)
+operation_latency = Histogram('beeah_dataset_operation_seconds', 'Duration of individual dataset operations.', ('phase', 'dataset'), LATENCY_BUCKETS)
+response_size = Histogram('beeah_response_bytes', 'Response payload size by endpoint.', ('endpoint',), SIZE_BUCKETS)
+dataset_rows = {}
+_rows_lock = Lock()
+_slow_lock = Lock()
+
+def log_slow_operation(phase, dataset, seconds, rows, size):
+    # One JSON object per line; O_APPEND keeps lines from different workers intact
+    entry = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pid': os.getpid(),
+        'phase': phase, 'dataset': dataset, 'duration_ms': round(seconds * 1000, 3),
+        'rows': rows, 'bytes': size,
+        'endpoint': request.endpoint if has_request_context() else None,
+        'method': request.method if has_request_context() else None,
+    }
+    with _slow_lock:
+        try:
+            if os.path.getsize(SLOW_LOG_FILE) > SLOW_LOG_MAX_BYTES:
+                os.replace(SLOW_LOG_FILE, SLOW_LOG_FILE + '.1')
+        except OSError:
+            pass
+        with open(SLOW_LOG_FILE, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+def read_slow_operations():
+    entries = []
+    for path in (SLOW_LOG_FILE + '.1', SLOW_LOG_FILE):
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try: entries.append(json.loads(line))
+                    except json.JSONDecodeError: continue
+        except FileNotFoundError:
+            continue
+    return entries
+
+def slow_operation_summary(limit=50):
+    # (phase, dataset, endpoint) -> count/total/worst, ordered by total time lost
+    groups = {}
+    for entry in read_slow_operations():
+        key = (entry.get('phase'), entry.get('dataset'), entry.get('endpoint'))
+        group = groups.setdefault(key, {'phase': key[0], 'dataset': key[1], 'endpoint': key[2], 'count': 0,
+                                        'total_ms': 0.0, 'max_ms': 0.0, 'max_rows': None, 'max_bytes': None, 'last': None})
+        duration = entry.get('duration_ms') or 0.0
+        group['count'] += 1
+        group['total_ms'] += duration
+        group['max_ms'] = max(group['max_ms'], duration)
+        for field, value in (('max_rows', entry.get('rows')), ('max_bytes', entry.get('bytes'))):
+            if value is not None and (group[field] is None or value > group[field]):
+                group[field] = value
+        group['last'] = max(group['last'] or '', entry.get('time') or '')
+    for group in groups.values():
+        group['avg_ms'] = round(group['total_ms'] / group['count'], 3)
+        group['total_ms'] = round(group['total_ms'], 3)
+    return sorted(groups.values(), key=lambda g: g['total_ms'], reverse=True)[:limit]
+
+def record_operation(phase, dataset, seconds, rows=None, size=None):
+    operation_latency.observe((phase, dataset), seconds)
+    if rows is not None and phase in ('load', 'save'):
+        with _rows_lock:
+            dataset_rows[dataset] = rows
+    if has_request_context():
+        phases = g.setdefault('metrics_phases', {})
+        phases[phase] = phases.get(phase, 0.0) + seconds
+    if phase != 'render' and SLOW_OPERATION_MS > 0 and seconds * 1000 >= SLOW_OPERATION_MS:
+        log_slow_operation(phase, dataset, seconds, rows, size)
+
+# file or directory name -> dataset label, so a dataset is reported under one name whether it
+# is timed by label or by path: timed(..., dataset=, path=) and name_dataset() register, anything
+# else is labelled by its file name without the extension (store_inventory.json -> store_inventory)
+_dataset_names = {}
+
+def name_dataset(path, dataset):
+    _dataset_names[os.path.basename(path)] = dataset
+
+def dataset_label(dataset, args):
+    if dataset:
+        return dataset
+    for arg in args:
+        if isinstance(arg, str):
+            name = os.path.basename(arg)
+            folder = os.path.basename(os.path.dirname(arg))
+            return _dataset_names.get(name) or _dataset_names.get(folder) or os.path.splitext(name)[0]
+    return 'unknown'
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+def timed(phase, dataset=None, path=None):
+    # Decorator for load/save/export helpers; without a dataset label the first string argument
+    # (the file path) names it. Rows come from a list result or list argument, bytes from the
+    # file on disk or the exported buffer.
+    if dataset and path:
+        name_dataset(path, dataset)
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            start = time.perf_counter()
+            result = f(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            rows = size = None
+            if phase == 'load' and isinstance(result, list):
+                rows = len(result)
+            elif phase == 'save' and args and isinstance(args[-1], list):
+                rows = len(args[-1])
+            if hasattr(result, 'getbuffer'):
+                size = result.getbuffer().nbytes
+            elif phase in ('load', 'save'):
+                size = _file_size(path or next((a for a in args if isinstance(a, str)), None))
+            record_operation(phase, dataset_label(dataset, args), seconds, rows, size)
+            return result
+        return decorated_function
+    return decorator
+
+@contextmanager
+def measure(phase, dataset, rows=None):
+    # For a step that is not a loop: with measure('scan', 'employees', len(all_employees)): ...
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_operation(phase, dataset, time.perf_counter() - start, rows)
+
+def scanned(records, dataset, phase='scan'):
+    # Wraps the iterable of a loop or comprehension: for emp in scanned(all_employees, 'employees'): ...
+    # The time is recorded once the loop finishes, breaks or raises.
+    start = time.perf_counter()
+    try:
+        yield from records
+    finally:
+        record_operation(phase, dataset, time.perf_counter() - start, len(records))
+
+def render_metrics():
+    lines = []
+    for histogram in (request_latency, phase_latency, operation_latency, response_size):
+        histogram.render(lines)
+    lines.append('# HELP beeah_dataset_rows Row count of each dataset at its last load or save.')
+    lines.append('# TYPE beeah_dataset_rows gauge')
+    with _rows_lock:
+        for dataset, rows in sorted(dataset_rows.items()):
+            lines.append(f'beeah_dataset_rows{{dataset="{_escape(dataset)}"}} {rows}')
+    return '\n'.join(lines) + '\n'
+
+def metrics_allowed():
+    if session.get('role') == 'Admin' or request.remote_addr in METRICS_ALLOWED_IPS:
+        return True
+    auth = request.headers.get('Authorization', '')
+    return bool(METRICS_TOKEN) and auth.startswith('Bearer ') and hmac.compare_digest(auth[7:].encode('utf-8'), METRICS_TOKEN.encode('utf-8'))
+
+def init_metrics(app):
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    def start_render(sender, template, context, **extra):
+        g.metrics_render_start = time.perf_counter()
+
+    def end_render(sender, template, context, **extra):
+        start = g.pop('metrics_render_start', None)
+        if start is not None:
+            record_operation('render', template.name or 'template', time.perf_counter() - start)
+
+    before_render_template.connect(start_render, app, weak=False)
+    template_rendered.connect(end_render, app, weak=False)
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        request_latency.observe((endpoint, request.method), time.perf_counter() - start)
+        for phase, seconds in g.pop('metrics_phases', {}).items():
+            phase_latency.observe((endpoint, phase), seconds)
+        if response.content_length is not None:
+            response_size.observe((endpoint,), response.content_length)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if not metrics_allowed():
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
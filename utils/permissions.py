@@ -1,11 +1,12 @@
 from flask import session, flash
+from utils.metrics import measure
+from collections import defaultdict
+from threading import Lock
+import heapq
 
 def can_modify(accommodation_name):
-    role = session.get('role')
-    if role in ['Admin', 'Manager']:
-        return True
-    allowed = session.get('allowed_accommodations', [])
-    if accommodation_name in allowed:
+    allowed = allowed_scope()
+    if allowed is None or accommodation_name in allowed:
         return True
     flash(f"Access Denied: You do not have permission for {accommodation_name}.")
     return False
@@ -17,4 +18,43 @@ def can_access_central_store():
     allowed = session.get('allowed_accommodations', [])
     if 'Sultan Accommodation' in allowed:
         return True
-    return False
\ No newline at end of file
+    return False
+
+def allowed_scope():
+    # None means every accommodation; otherwise the set of accommodations the user may see
+    if session.get('role') in ['Admin', 'Manager']:
+        return None
+    # server-side sessions keep the resolved set for the life of the session
+    allowed = getattr(session, 'allowed_set', None)
+    if allowed is None:
+        allowed = frozenset(session.get('allowed_accommodations', []))
+        if hasattr(session, 'allowed_set'):
+            session.allowed_set = allowed
+    return allowed
+
+_partitions = {}
+_partitions_lock = Lock()
+
+def partition_by_accommodation(records, dataset, field='accommodation', version=None):
+    # accommodation -> [(position, record)], rebuilt only when the list or its file changes
+    key = (dataset, field)
+    with _partitions_lock:
+        cached = _partitions.get(key)
+        if cached and cached['records'] is records and cached['size'] == len(records) and cached['version'] == version:
+            return cached['partitions']
+
+    partitions = defaultdict(list)
+    for position, record in enumerate(records):
+        partitions[record.get(field)].append((position, record))
+    with _partitions_lock:
+        _partitions[key] = {'records': records, 'size': len(records), 'version': version, 'partitions': partitions}
+    return partitions
+
+def scoped_records(records, dataset, field='accommodation', version=None):
+    allowed = allowed_scope()
+    if allowed is None:
+        return records
+    with measure('filter', dataset, len(records)):
+        partitions = partition_by_accommodation(records, dataset, field, version)
+        # merge the user's partitions back into file order
+        return [record for _, record in heapq.merge(*(partitions[acc] for acc in allowed if acc in partitions))]
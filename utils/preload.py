@@ -0,0 +1,114 @@
+from array import array
+from collections.abc import Mapping, Sequence
+import gc
+import os
+
+# PRELOAD_DATASETS=1 with gunicorn --preload: the master loads every dataset once, packed
+# into FrozenRecords, and forked workers share those pages instead of each parsing its own
+# copy. A worker's first write to a dataset reloads a private mutable copy of that dataset.
+PRELOAD_DATASETS = os.environ.get('PRELOAD_DATASETS') == '1'
+
+_MISSING = object()
+
+class FrozenRecord(Mapping):
+    # Read-only view of one row; reads like the dict it replaces
+    __slots__ = ('_columns', '_row')
+
+    def __init__(self, columns, row):
+        self._columns = columns
+        self._row = row
+
+    def __getitem__(self, key):
+        values, codes = self._columns[key]
+        value = values[codes[self._row]]
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        column = self._columns.get(key)
+        if column is None:
+            return default
+        value = column[0][column[1][self._row]]
+        return default if value is _MISSING else value
+
+    def __iter__(self):
+        row = self._row
+        return (key for key, (values, codes) in self._columns.items() if codes[row])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def copy(self):
+        return dict(self)
+
+    def __repr__(self):
+        return f'FrozenRecord({dict(self)!r})'
+
+class FrozenRecords(Sequence):
+    # A list of JSON records packed by column: each column is an array of 4-byte codes
+    # into a tuple of its distinct values. The bulk of the data sits in array buffers that
+    # refcounting and the garbage collector never write to, so after a fork those pages
+    # stay shared.
+    __slots__ = ('_columns', '_length')
+
+    def __init__(self, records):
+        keys = {}
+        for record in records:
+            for key in record:
+                keys.setdefault(key, None)
+        columns = {}
+        for key in keys:
+            values, index, codes = [_MISSING], {}, array('I')
+            for record in records:
+                value = record.get(key, _MISSING)
+                if value is _MISSING:
+                    codes.append(0)
+                    continue
+                try:
+                    # type in the key keeps 1, 1.0 and True apart
+                    marker = (type(value), value)
+                    code = index.get(marker)
+                    if code is None:
+                        code = index[marker] = len(values)
+                        values.append(value)
+                except TypeError:
+                    code = len(values)
+                    values.append(value)
+                codes.append(code)
+            columns[key] = (tuple(values), codes)
+        self._columns = columns
+        self._length = len(records)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [FrozenRecord(self._columns, row) for row in range(*position.indices(self._length))]
+        if position < 0:
+            position += self._length
+        if not 0 <= position < self._length:
+            raise IndexError('record index out of range')
+        return FrozenRecord(self._columns, position)
+
+    def __iter__(self):
+        columns = self._columns
+        for row in range(self._length):
+            yield FrozenRecord(columns, row)
+
+    def thaw(self):
+        return [dict(record) for record in self]
+
+def freeze_records(records):
+    return records if isinstance(records, FrozenRecords) else FrozenRecords(records)
+
+def preload_datasets(guards, warm=()):
+    for guard in guards:
+        guard.preload()
+    for build in warm:
+        build()
+    # Move everything loaded so far out of the collector's reach; otherwise the first
+    # full collection in each worker writes to every object header and unshares the pages
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,142 @@
+from flask import request, session, g
+import cProfile
+import datetime
+import importlib.util
+import json
+import os
+import pstats
+import time
+import uuid
+
+# pyinstrument is optional and only imported when a sampled profile is requested
+SAMPLING_AVAILABLE = importlib.util.find_spec('pyinstrument') is not None
+
+PROFILE_DIR = os.path.join(os.environ.get('RENDER_DATA_DIR', '.'), 'profiles')
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+PROFILE_TOP = 15
+
+def requested_mode():
+    # ?_profile=1 or "X-Profile: 1" uses cProfile; "sample" uses pyinstrument when installed
+    value = request.args.get(PROFILE_PARAM) or request.headers.get(PROFILE_HEADER)
+    if not value or session.get('role') != 'Admin':
+        return None
+    if value == 'sample' and SAMPLING_AVAILABLE:
+        return 'sample'
+    return 'cprofile'
+
+def _label(filename, lineno, function):
+    if filename == '~':
+        return function
+    path = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    if path.startswith('..'):
+        path = filename.split('site-packages' + os.sep)[-1] if 'site-packages' in filename else os.path.basename(filename)
+    return f'{path}:{lineno}({function})'
+
+def cprofile_top(profiler):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, lineno, function), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({'function': _label(filename, lineno, function), 'calls': nc,
+                     'tottime_ms': round(tt * 1000, 3), 'cumtime_ms': round(ct * 1000, 3)})
+    rows.sort(key=lambda r: r['cumtime_ms'], reverse=True)
+    return rows[:PROFILE_TOP]
+
+def sampling_top(profiler):
+    totals = {}
+    def walk(frame, active):
+        key = _label(frame.file_path or '~', frame.line_no, frame.function)
+        if key not in active:
+            totals[key] = totals.get(key, 0.0) + frame.time
+        for child in frame.children:
+            walk(child, active | {key})
+    root = profiler.last_session.root_frame()
+    if root is not None:
+        walk(root, frozenset())
+    rows = [{'function': k, 'calls': None, 'tottime_ms': None, 'cumtime_ms': round(v * 1000, 3)} for k, v in totals.items()]
+    rows.sort(key=lambda r: r['cumtime_ms'], reverse=True)
+    return rows[:PROFILE_TOP]
+
+def save_profile(mode, profiler, duration, status):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+    if mode == 'sample':
+        filename = profile_id + '.html'
+        with open(os.path.join(PROFILE_DIR, filename), 'w') as f:
+            f.write(profiler.output_html())
+        top = sampling_top(profiler)
+    else:
+        filename = profile_id + '.prof'
+        profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+        top = cprofile_top(profiler)
+
+    meta = {
+        'id': profile_id, 'file': filename, 'profiler': mode,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'method': request.method, 'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint, 'username': session.get('username'),
+        'status': status, 'duration_ms': round(duration * 1000, 3), 'top': top
+    }
+    with open(os.path.join(PROFILE_DIR, profile_id + '.json'), 'w') as f:
+        json.dump(meta, f, indent=4)
+    prune_profiles()
+    return profile_id
+
+def list_profiles():
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith('.json')]
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in sorted(names, reverse=True):
+        try:
+            with open(os.path.join(PROFILE_DIR, name), 'r') as f: profiles.append(json.load(f))
+        except (OSError, json.JSONDecodeError): continue
+    return profiles
+
+def prune_profiles():
+    for meta in list_profiles()[PROFILE_KEEP:]:
+        for name in (meta['id'] + '.json', meta['file']):
+            try: os.remove(os.path.join(PROFILE_DIR, name))
+            except FileNotFoundError: pass
+
+def _stop(mode, profiler):
+    if mode == 'sample':
+        profiler.stop()
+    else:
+        profiler.disable()
+
+def init_profiler(app):
+    @app.before_request
+    def start_profile():
+        mode = requested_mode()
+        if mode is None:
+            return
+        if mode == 'sample':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+        else:
+            profiler = cProfile.Profile()
+        g.profile = (mode, profiler, time.perf_counter())
+        if mode == 'sample':
+            profiler.start()
+        else:
+            profiler.enable()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        mode, profiler, start = profile
+        _stop(mode, profiler)
+        response.headers['X-Profile-Id'] = save_profile(mode, profiler, time.perf_counter() - start, response.status_code)
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # after_request is skipped when the view raises; never leave a profiler running
+        profile = g.pop('profile', None)
+        if profile is not None:
+            _stop(profile[0], profile[1])
@@ -0,0 +1,128 @@
+from utils.roster import VACANT, column_values
+from collections import Counter
+import re
+
+# Rows of checked-out staff keep Accommodation 'N/A'; they hold no bed
+NO_ACCOMMODATION = ('', 'N/A', None)
+
+_block_pattern = re.compile(r'\s*([A-Za-z]+)')
+
+def room_block(room):
+    # Block is the room code's letter prefix: Ag01 -> Ag, BF02 -> BF, 101 -> ''
+    match = _block_pattern.match(room) if isinstance(room, str) else None
+    return match.group(1) if match else ''
+
+def _bitmap(bits, size):
+    buffer = bytearray((size + 7) // 8)
+    for bit in bits:
+        buffer[bit >> 3] |= 1 << (bit & 7)
+    return int.from_bytes(buffer, 'little')
+
+def _set_bits(mask, limit=None):
+    # Positions of the set bits, lowest first; one pass over the bitmap's bytes
+    found = []
+    for index, byte in enumerate(mask.to_bytes((mask.bit_length() + 7) // 8, 'little')):
+        while byte:
+            low = byte & -byte
+            found.append(index * 8 + low.bit_length() - 1)
+            if len(found) == limit:
+                return found
+            byte ^= low
+    return found
+
+class AccommodationBeds:
+    # Every bed (roster row) of one accommodation, numbered in file order. Occupancy is a
+    # bitmap in a Python int: bit i of free is set while bed i is vacant, and each block
+    # has a mask of its beds, so vacancy counts are a popcount and "N free beds" one scan.
+    __slots__ = ('name', 'positions', 'bed_rooms', 'rooms', 'blocks', 'block_masks', 'free')
+
+    def __init__(self, name, beds):
+        # beds: (roster position, room, vacant) in file order
+        self.name = name
+        self.positions = []
+        self.bed_rooms = []
+        self.rooms = {}
+        self.blocks = {}
+        block_beds = {}
+        free = []
+        for bed, (position, room, vacant) in enumerate(beds):
+            self.positions.append(position)
+            self.bed_rooms.append(room)
+            if room not in self.rooms:
+                self.rooms[room] = []
+                self.blocks.setdefault(room_block(room), []).append(room)
+            self.rooms[room].append(bed)
+            block_beds.setdefault(room_block(room), []).append(bed)
+            if vacant:
+                free.append(bed)
+        size = len(self.positions)
+        self.block_masks = {block: _bitmap(members, size) for block, members in block_beds.items()}
+        self.free = _bitmap(free, size)
+
+    @property
+    def bed_count(self):
+        return len(self.positions)
+
+    def _free_mask(self, block):
+        return self.free if block is None else self.free & self.block_masks.get(block, 0)
+
+    def free_count(self, block=None):
+        return self._free_mask(block).bit_count()
+
+    def free_beds(self, count=None, block=None):
+        return _set_bits(self._free_mask(block), count)
+
+    def is_free(self, bed):
+        return (self.free >> bed) & 1 == 1
+
+    def free_bed_in_room(self, room):
+        return next((bed for bed in self.rooms.get(room, ()) if self.is_free(bed)), None)
+
+    def free_by_room(self):
+        rooms = self.bed_rooms
+        return Counter(rooms[bed] for bed in self.free_beds())
+
+    def vacant_rooms(self):
+        return list(self.free_by_room())
+
+    def occupy(self, bed):
+        self.free &= ~(1 << bed)
+
+    def release(self, bed):
+        self.free |= 1 << bed
+
+    def summary(self):
+        free_by_room = self.free_by_room()
+        return {
+            'accommodation': self.name,
+            'beds': self.bed_count,
+            'free': self.free_count(),
+            'blocks': [{
+                'block': block,
+                'beds': self.block_masks[block].bit_count(),
+                'free': self.free_count(block),
+                'rooms': [{'room': room, 'beds': len(self.rooms[room]), 'free': free_by_room.get(room, 0)} for room in rooms]
+            } for block, rooms in self.blocks.items()]
+        }
+
+class RoomInventory:
+    # accommodation -> block -> room -> beds, derived from the roster: each row with an
+    # accommodation is one bed, vacant while its Status is 'Vacant'
+    def __init__(self, records):
+        beds = {}
+        rows = zip(column_values(records, 'Accommodation'), column_values(records, 'Room'), column_values(records, 'Status'))
+        for position, (accommodation, room, status) in enumerate(rows):
+            if accommodation not in NO_ACCOMMODATION:
+                beds.setdefault(accommodation, []).append((position, room, status == VACANT))
+        self.accommodations = {name: AccommodationBeds(name, members) for name, members in beds.items()}
+
+    def get(self, accommodation):
+        return self.accommodations.get(accommodation)
+
+    def free_count(self, accommodation, block=None):
+        beds = self.accommodations.get(accommodation)
+        return beds.free_count(block) if beds else 0
+
+    def vacant_rooms(self, accommodation):
+        beds = self.accommodations.get(accommodation)
+        return beds.vacant_rooms() if beds else []
@@ -0,0 +1,173 @@
+from collections.abc import Mapping
+import sys
+
+# data.json column -> Employee slot, in the order records are written back out
+FIELDS = {
+    'Accommodation': 'accommodation',
+    'Room': 'room',
+    'SAP ID': 'sap_id',
+    'Emp Name': 'name',
+    'Designation': 'designation',
+    'Department': 'department',
+    'Status': 'status',
+    'Nationality': 'nationality',
+}
+# Few distinct values across the roster, so every record shares one string object per value
+CATEGORICAL = ('accommodation', 'room', 'designation', 'department', 'status', 'nationality')
+
+VACANT = sys.intern('Vacant')
+ACTIVE = sys.intern('Active')
+
+_MISSING = object()
+
+def parse_sap_id(value):
+    # 14605.0, '14605' and 14605 all become 14605; anything else ('' for vacant rows) is kept as is
+    if isinstance(value, int):
+        return value
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        return value
+    return int(number) if number.is_integer() else value
+
+def _coerce(slot, value):
+    if slot == 'sap_id':
+        return parse_sap_id(value)
+    if slot in CATEGORICAL and type(value) is str:
+        return sys.intern(value)
+    return value
+
+class Employee:
+    # One roster row. Reads and writes like the dict it replaces (emp['SAP ID'], emp.get(),
+    # emp.update()), so templates and callers are unchanged; columns outside FIELDS are kept
+    # in extra. A field missing from the source row stays missing on the way back out.
+    __slots__ = tuple(FIELDS.values()) + ('extra',)
+
+    def __init__(self, **fields):
+        for slot in FIELDS.values():
+            setattr(self, slot, _coerce(slot, fields[slot]) if slot in fields else _MISSING)
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, record):
+        emp = cls.__new__(cls)
+        for key, slot in FIELDS.items():
+            value = record.get(key, _MISSING)
+            setattr(emp, slot, _MISSING if value is _MISSING else _coerce(slot, value))
+        extra = {key: value for key, value in record.items() if key not in FIELDS}
+        emp.extra = extra or None
+        return emp
+
+    @classmethod
+    def vacant(cls, accommodation, room):
+        return cls(accommodation=accommodation, room=room, sap_id='', name='', designation='',
+                   department='', status=VACANT, nationality='')
+
+    @property
+    def is_vacant(self):
+        return self.status == VACANT
+
+    def to_dict(self):
+        record = {}
+        for key, slot in FIELDS.items():
+            value = getattr(self, slot)
+            if value is not _MISSING:
+                record[key] = value
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+    def __getitem__(self, key):
+        slot = FIELDS.get(key)
+        value = getattr(self, slot) if slot else (self.extra or {}).get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        slot = FIELDS.get(key)
+        value = getattr(self, slot) if slot else (self.extra or {}).get(key, _MISSING)
+        return default if value is _MISSING else value
+
+    def __setitem__(self, key, value):
+        slot = FIELDS.get(key)
+        if slot:
+            setattr(self, slot, _coerce(slot, value))
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def update(self, other=(), **kwargs):
+        items = other.items() if hasattr(other, 'items') else other
+        for key, value in items:
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def values(self):
+        return self.to_dict().values()
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def copy(self):
+        emp = Employee.__new__(Employee)
+        for slot in FIELDS.values():
+            setattr(emp, slot, getattr(self, slot))
+        emp.extra = dict(self.extra) if self.extra else None
+        return emp
+
+    def __eq__(self, other):
+        if isinstance(other, Employee):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'Employee({self.to_dict()!r})'
+
+Mapping.register(Employee)
+
+def employees_from_records(records):
+    return [Employee.from_dict(record) for record in records]
+
+def employees_to_records(employees):
+    return [emp.to_dict() if isinstance(emp, Employee) else dict(emp) for emp in employees]
+
+def roster_columns(records):
+    # Export column order: FIELDS, then any extra columns in order of first appearance
+    columns = dict.fromkeys(FIELDS)
+    for record in records:
+        extra = record.extra if isinstance(record, Employee) else record
+        if extra:
+            for key in extra:
+                columns.setdefault(key, None)
+    return list(columns)
+
+def column_values(records, key, default=None):
+    # One column as a list; attribute reads for Employee rows, .get() for anything else
+    slot = FIELDS.get(key)
+    if slot and records and isinstance(records[0], Employee):
+        try:
+            values = [getattr(record, slot) for record in records]
+        except AttributeError:
+            pass
+        else:
+            return [default if value is _MISSING else value for value in values]
+    return [record.get(key, default) for record in records]
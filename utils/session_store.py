@@ -0,0 +1,225 @@
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+from collections import OrderedDict
+from threading import Lock
+import json
+import os
+import secrets
+import sqlite3
+import time
+
+SESSION_CACHE_SIZE = 10000
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.allowed_set = None
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.allowed_set = None
+        self.version = None
+        self.expires = None
+
+class SQLiteSessionBackend:
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, username TEXT, expires REAL, data TEXT)')
+            conn.execute('CREATE INDEX IF NOT EXISTS sessions_username ON sessions (username)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def version(self, sid):
+        # expires is rewritten with a fresh timestamp on every save, so it doubles as a version
+        with self._connect() as conn:
+            row = conn.execute('SELECT expires FROM sessions WHERE sid = ?', (sid,)).fetchone()
+        if not row or row[0] < time.time():
+            return None
+        return row[0]
+
+    def load(self, sid):
+        with self._connect() as conn:
+            row = conn.execute('SELECT data, expires FROM sessions WHERE sid = ?', (sid,)).fetchone()
+        if not row or row[1] < time.time():
+            return None, None, None
+        return row[0], row[1], row[1]
+
+    def save(self, sid, username, expires, data):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (sid, username, expires, data) VALUES (?, ?, ?, ?)', (sid, username, expires, data))
+            conn.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),))
+        return expires
+
+    def delete(self, sid):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def delete_user(self, username):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT sid FROM sessions WHERE username = ?', (username,)).fetchall()
+            conn.execute('DELETE FROM sessions WHERE username = ?', (username,))
+        return [row[0] for row in rows]
+
+class FileSessionBackend:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, f'{sid}.json')
+
+    def version(self, sid):
+        try:
+            return os.stat(self._path(sid)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self, sid):
+        try:
+            version = os.stat(self._path(sid)).st_mtime_ns
+            with open(self._path(sid), 'r') as f: record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError): return None, None, None
+        if record['expires'] < time.time():
+            return None, None, None
+        return record['data'], version, record['expires']
+
+    def save(self, sid, username, expires, data):
+        tmp_path = f'{self._path(sid)}.{secrets.token_hex(4)}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'username': username, 'expires': expires, 'data': data}, f)
+        os.replace(tmp_path, self._path(sid))
+        return os.stat(self._path(sid)).st_mtime_ns
+
+    def delete(self, sid):
+        try: os.remove(self._path(sid))
+        except FileNotFoundError: pass
+
+    def delete_user(self, username):
+        revoked = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            sid = name[:-5]
+            try:
+                with open(self._path(sid), 'r') as f: record = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError): continue
+            if record.get('username') == username:
+                self.delete(sid)
+                revoked.append(sid)
+        return revoked
+
+class ServerSideSessionInterface(SessionInterface):
+    # The cookie only carries an opaque id; session data lives in the backend. Each worker
+    # keeps an LRU of decoded sessions (with their resolved permission set) keyed by the
+    # backend version, so a session changed or revoked by another worker is never served stale.
+    def __init__(self, backend):
+        self.backend = backend
+        self._cache = OrderedDict()
+        self._lock = Lock()
+
+    def _cache_put(self, sid, version, expires, data, allowed_set):
+        with self._lock:
+            self._cache[sid] = (version, expires, data, allowed_set)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > SESSION_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            with self._lock:
+                cached = self._cache.get(sid)
+            if cached is not None and cached[1] >= time.time() and self.backend.version(sid) == cached[0]:
+                # a fresh object per request: concurrent requests on one session never share state
+                version, expires, data, allowed_set = cached
+                sess = ServerSession(dict(data), sid=sid)
+                sess.allowed_set = allowed_set
+                sess.version = version
+                sess.expires = expires
+                return sess
+            raw, version, expires = self.backend.load(sid)
+            if raw is not None:
+                sess = ServerSession(session_json_serializer.loads(raw), sid=sid)
+                sess.version = version
+                sess.expires = expires
+                self._cache_put(sid, version, expires, dict(sess), None)
+                return sess
+            with self._lock:
+                self._cache.pop(sid, None)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                with self._lock:
+                    self._cache.pop(session.sid, None)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        set_cookie = self.should_set_cookie(app, session)
+        if session.modified:
+            session.expires = time.time() + app.permanent_session_lifetime.total_seconds()
+            session.version = self.backend.save(session.sid, session.get('username'), session.expires,
+                                                session_json_serializer.dumps(dict(session)))
+            session.modified = False
+            session.new = False
+        if not session.new:
+            self._cache_put(session.sid, session.version, session.expires, dict(session), session.allowed_set)
+
+        if set_cookie:
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+    def regenerate(self, session):
+        # Called on login: the id a client held while anonymous is dropped, never promoted
+        if not session.new:
+            self.backend.delete(session.sid)
+            with self._lock:
+                self._cache.pop(session.sid, None)
+        session.sid = secrets.token_urlsafe(32)
+        session.new = True
+        session.version = None
+        session.modified = True
+
+    def revoke_user(self, username):
+        # Deleting from the backend is enough: other workers see the version disappear
+        revoked = self.backend.delete_user(username)
+        with self._lock:
+            for sid in revoked:
+                self._cache.pop(sid, None)
+
+def init_session_store(app):
+    backend_name = os.environ.get('SESSION_BACKEND', 'sqlite')
+    if backend_name == 'cookie':
+        return
+
+    session_dir = os.path.join(os.environ.get('RENDER_DATA_DIR', '.'), 'sessions')
+    os.makedirs(session_dir, exist_ok=True)
+    if backend_name == 'filesystem':
+        backend = FileSessionBackend(session_dir)
+    else:
+        backend = SQLiteSessionBackend(os.path.join(session_dir, 'sessions.db'))
+    app.session_interface = ServerSideSessionInterface(backend)
+
+def revoke_user_sessions(app, username):
+    if isinstance(app.session_interface, ServerSideSessionInterface):
+        app.session_interface.revoke_user(username)
+
+def regenerate_session(app, session):
+    if isinstance(app.session_interface, ServerSideSessionInterface):
+        app.session_interface.regenerate(session)
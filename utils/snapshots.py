@@ -0,0 +1,73 @@
+import json
+import os
+import pickle
+import struct
+import uuid
+import zlib
+
+# <file>.snap mirrors a JSON dataset as a pickle (protocol 5) behind a fixed header:
+# magic, format version, the (mtime_ns, size) of the JSON it was taken from, payload
+# length and CRC32. The JSON stays the source of truth; a snapshot whose recorded
+# version no longer matches the JSON on disk is ignored and rewritten on next load.
+# Saves never write one, so the write path pays only for the JSON; the first cold load
+# after a save pays for the pickle instead.
+SNAPSHOTS_ENABLED = os.environ.get('DATASET_SNAPSHOTS', '1') == '1'
+SNAPSHOT_MIN_BYTES = int(os.environ.get('SNAPSHOT_MIN_BYTES', 64 * 1024))
+SNAPSHOT_SUFFIX = '.snap'
+SNAPSHOT_MAGIC = b'BEEAHSNP'
+SNAPSHOT_FORMAT = 1
+_header = struct.Struct('>8sBqqQI')
+
+def snapshot_path(file_path):
+    return file_path + SNAPSHOT_SUFFIX
+
+def write_snapshot(file_path, data, source):
+    # source is the os.stat_result of the JSON the data was read from or written to
+    if not SNAPSHOTS_ENABLED or source.st_size < SNAPSHOT_MIN_BYTES:
+        return
+    payload = pickle.dumps(data, protocol=5)
+    header = _header.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, source.st_mtime_ns, source.st_size, len(payload), zlib.crc32(payload))
+    path = snapshot_path(file_path)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except OSError:
+        # A snapshot is only an accelerator; never fail the save over it
+        try: os.remove(tmp_path)
+        except OSError: pass
+
+def read_snapshot(file_path, source):
+    # Returns the data, or None when there is no usable snapshot for this exact JSON version
+    if not SNAPSHOTS_ENABLED:
+        return None
+    try:
+        with open(snapshot_path(file_path), 'rb') as f:
+            blob = f.read()
+    except OSError:
+        return None
+    if len(blob) < _header.size:
+        return None
+    magic, fmt, mtime_ns, size, length, crc = _header.unpack_from(blob)
+    if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT or (mtime_ns, size) != (source.st_mtime_ns, source.st_size):
+        return None
+    payload = memoryview(blob)[_header.size:]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        return None
+    try:
+        return pickle.loads(payload)
+    except Exception:
+        return None
+
+def load_json(file_path):
+    # Drop-in for json.load(open(file_path)): same exceptions, but served from the snapshot when fresh
+    with open(file_path, 'r') as f:
+        source = os.fstat(f.fileno())
+        data = read_snapshot(file_path, source)
+        if data is not None:
+            return data
+        data = json.load(f)
+    write_snapshot(file_path, data, source)
+    return data
@@ -0,0 +1,143 @@
+from werkzeug.security import generate_password_hash, check_password_hash
+from utils.fragment_cache import dataset_version
+from utils.metrics import timed
+from utils.datastore import DatasetGuard, atomic_write
+from utils.snapshots import load_json
+from collections import defaultdict, deque
+from threading import Lock
+import hmac
+import json
+import os
+import time
+
+USERS_FILE = 'users.json'
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+LOGIN_MAX_ATTEMPTS = int(os.environ.get('LOGIN_MAX_ATTEMPTS', 10))
+LOGIN_WINDOW_SECONDS = int(os.environ.get('LOGIN_WINDOW_SECONDS', 300))
+# Failures per client address over all usernames, for bursts that try a new username each time
+LOGIN_MAX_IP_ATTEMPTS = int(os.environ.get('LOGIN_MAX_IP_ATTEMPTS', 50))
+LOGIN_MAX_TRACKED = int(os.environ.get('LOGIN_MAX_TRACKED', 10000))
+
+_directory = {'version': None, 'users': [], 'by_name': {}}
+_failed_attempts = defaultdict(lambda: deque(maxlen=LOGIN_MAX_ATTEMPTS))
+_failed_by_ip = defaultdict(lambda: deque(maxlen=LOGIN_MAX_IP_ATTEMPTS))
+_last_sweep = [0.0]
+_dummy_hash = []
+_lock = Lock()
+users_guard = DatasetGuard(USERS_FILE)
+
+@timed('load', dataset='users', path=USERS_FILE)
+def _read_users_file():
+    try:
+        return load_json(USERS_FILE)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def _refresh(users, version):
+    _directory['users'] = users
+    _directory['by_name'] = {u.get('username'): u for u in users}
+    _directory['version'] = version
+
+def _current():
+    # users.json is only re-read when another worker (or an editor) has changed it
+    version = dataset_version(USERS_FILE)
+    with _lock:
+        if _directory['version'] != version:
+            _refresh(_read_users_file(), version)
+        return _directory
+
+def users_version():
+    return _current()['version']
+
+def load_users():
+    return [dict(u) for u in _current()['users']]
+
+def get_user(username):
+    user = _current()['by_name'].get(username)
+    return dict(user) if user else None
+
+def save_users(users):
+    with _lock:
+        atomic_write(USERS_FILE, users)
+        _refresh([dict(u) for u in users], dataset_version(USERS_FILE))
+
+def hash_password(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+def is_password_hash(value):
+    return isinstance(value, str) and value.startswith(('pbkdf2:', 'scrypt:')) and value.count('$') == 2
+
+def _fail_slowly(password):
+    # Same hash work as a hashed account, so response times do not reveal which usernames exist
+    if not _dummy_hash:
+        _dummy_hash.append(hash_password(os.urandom(16).hex()))
+    check_password_hash(_dummy_hash[0], password)
+    return None
+
+def authenticate(username, password):
+    if not password:
+        return None
+    user = get_user(username)
+    if not user:
+        return _fail_slowly(password)
+
+    stored = user.get('password') or ''
+    if is_password_hash(stored):
+        return user if check_password_hash(stored, password) else None
+
+    # Plaintext entry from before hashing: verify once, then migrate it in place
+    if not hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8')):
+        return _fail_slowly(password)
+    with users_guard.locked():
+        users = load_users()
+        for u in users:
+            if u.get('username') == username and u.get('password') == stored:
+                u['password'] = hash_password(password)
+        save_users(users)
+    return get_user(username)
+
+def _attempt_key(username, ip):
+    # Per account and client, so failures from one address never lock out other users
+    return ((username or '').strip().lower(), ip)
+
+def _recent(attempts, now):
+    while attempts and attempts[0] < now - LOGIN_WINDOW_SECONDS:
+        attempts.popleft()
+    return len(attempts)
+
+def _sweep(now):
+    # Caller holds _lock. Drops counters whose newest failure is outside the window, at most
+    # once per window, and the oldest counters beyond LOGIN_MAX_TRACKED.
+    if now - _last_sweep[0] >= LOGIN_WINDOW_SECONDS:
+        _last_sweep[0] = now
+        for counters in (_failed_attempts, _failed_by_ip):
+            for key in [key for key, attempts in counters.items() if attempts[-1] < now - LOGIN_WINDOW_SECONDS]:
+                del counters[key]
+    for counters in (_failed_attempts, _failed_by_ip):
+        while len(counters) > LOGIN_MAX_TRACKED:
+            del counters[next(iter(counters))]
+
+def login_throttled(username, ip):
+    key = _attempt_key(username, ip)
+    now = time.time()
+    with _lock:
+        for counters, counter_key, limit in ((_failed_attempts, key, LOGIN_MAX_ATTEMPTS), (_failed_by_ip, ip, LOGIN_MAX_IP_ATTEMPTS)):
+            attempts = counters.get(counter_key)
+            if attempts is None:
+                continue
+            if not _recent(attempts, now):
+                del counters[counter_key]
+            elif len(attempts) >= limit:
+                return True
+        return False
+
+def record_login_attempt(username, ip, success):
+    key = _attempt_key(username, ip)
+    now = time.time()
+    with _lock:
+        if success:
+            _failed_attempts.pop(key, None)
+        else:
+            _failed_attempts[key].append(now)
+            _failed_by_ip[ip].append(now)
+            _sweep(now)